@@ -0,0 +1,145 @@
+from settings import *
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+def file_hash(path):
+	with open(path, 'rb') as file:
+		return hashlib.sha1(file.read()).hexdigest()
+
+class AssetCache:
+	# magic, format version, index size, followed by the json index and the pixel data
+	MAGIC, VERSION = b'VDAC', 1
+	HEADER = struct.Struct('<4sIQ')
+
+	def __init__(self, path):
+		self.path = path
+		self.file = self.buffer = None
+		self.index = {}
+		self.data_start = 0
+
+		# entries built this session, written by save()
+		self.fresh = {}
+		self.dirty = False
+		self.load()
+
+	def load(self):
+		try:
+			self.file = open(self.path, 'rb')
+			self.buffer = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+			magic, version, index_size = self.HEADER.unpack_from(self.buffer)
+			if magic != self.MAGIC or version != self.VERSION:
+				raise ValueError('unknown asset cache format')
+			self.index = json.loads(self.buffer[self.HEADER.size:self.HEADER.size + index_size])
+			self.data_start = self.HEADER.size + index_size
+		except (OSError, ValueError, struct.error):
+			self.close()
+			self.index = {}
+
+	def close(self):
+		if self.buffer:
+			self.buffer.close()
+		if self.file:
+			self.file.close()
+		self.file = self.buffer = None
+
+	def fresh_sources(self):
+		# source files that are served from the cache and need no decoding
+		sources = set()
+		for entry in self.index.values():
+			for source, (mtime, size, _) in entry['sources'].items():
+				try:
+					stat = os.stat(source)
+				except OSError:
+					continue
+				if (stat.st_mtime_ns, stat.st_size) == (mtime, size):
+					sources.add(os.path.normpath(source))
+		return sources
+
+	def get(self, key, sources, build):
+		entry = self.index.get(key)
+		if entry and key not in self.fresh and self.check_sources(entry, sources):
+			return self.decode(entry['tree'], self.data_start + entry['offset'])
+
+		tree = build()
+		self.fresh[key] = (sources, tree)
+		self.dirty = True
+		return tree
+
+	def check_sources(self, entry, sources):
+		stored = entry['sources']
+		if sorted(stored) != sorted(sources):
+			return False
+		for source in sources:
+			try:
+				stat = os.stat(source)
+			except OSError:
+				return False
+			mtime, size, digest = stored[source]
+			if (stat.st_mtime_ns, stat.st_size) != (mtime, size):
+				# touched but unchanged files only need their mtime updated
+				if file_hash(source) != digest:
+					return False
+				stored[source] = [stat.st_mtime_ns, stat.st_size, digest]
+				self.dirty = True
+		return True
+
+	# nested dicts and lists of surfaces
+	def encode(self, tree, data):
+		if isinstance(tree, pygame.Surface):
+			offset = len(data)
+			data += pygame.image.tobytes(tree.convert_alpha(), 'RGBA')
+			return {'surface': [offset, tree.get_width(), tree.get_height()]}
+		if isinstance(tree, dict):
+			return {'dict': {key: self.encode(value, data) for key, value in tree.items()}}
+		return {'list': [self.encode(value, data) for value in tree]}
+
+	def decode(self, node, start):
+		if 'surface' in node:
+			offset, width, height = node['surface']
+			pixels = self.buffer[start + offset:start + offset + width * height * 4]
+			return pygame.image.frombuffer(pixels, (width, height), 'RGBA').convert_alpha()
+		if 'dict' in node:
+			return {key: self.decode(value, start) for key, value in node['dict'].items()}
+		return [self.decode(value, start) for value in node['list']]
+
+	def save(self):
+		if not self.dirty:
+			return
+
+		# unchanged entries are copied over as they are
+		entries, blocks, size = {}, [], 0
+		for key, entry in self.index.items():
+			if key not in self.fresh:
+				start = self.data_start + entry['offset']
+				blocks.append(self.buffer[start:start + entry['size']])
+				entries[key] = dict(entry, offset = size)
+				size += entry['size']
+
+		for key, (sources, tree) in self.fresh.items():
+			data = bytearray()
+			node = self.encode(tree, data)
+			stats = {source: os.stat(source) for source in sources}
+			entries[key] = {
+				'sources': {source: [stat.st_mtime_ns, stat.st_size, file_hash(source)] for source, stat in stats.items()},
+				'tree': node,
+				'offset': size,
+				'size': len(data)}
+			blocks.append(data)
+			size += len(data)
+
+		index = json.dumps(entries).encode()
+		self.close()
+		os.makedirs(os.path.dirname(self.path), exist_ok = True)
+		with open(self.path + '.tmp', 'wb') as file:
+			file.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(index)))
+			file.write(index)
+			for block in blocks:
+				file.write(block)
+		os.replace(self.path + '.tmp', self.path)
+
+		self.fresh.clear()
+		self.dirty = False
+		self.load()
@@ -0,0 +1,56 @@
+import os
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from settings import *
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from os.path import normpath, splitext
+from time import perf_counter
+import support
+
+IMAGE_FORMATS = ('.png', '.jpg')
+AUDIO_FORMATS = ('.wav', '.ogg', '.mp3')
+
+# worker side
+def init_worker(mixer_settings):
+	# sounds are decoded to the same raw format the main mixer uses
+	os.environ['SDL_AUDIODRIVER'] = 'dummy'
+	if mixer_settings:
+		frequency, size, channels = mixer_settings
+		pygame.mixer.init(frequency, size, channels)
+
+def decode_asset(path):
+	start = perf_counter()
+	if path.endswith(IMAGE_FORMATS):
+		surf = pygame.image.load(path)
+		data = (pygame.image.tobytes(surf, 'RGBA'), surf.get_size())
+	else:
+		data = pygame.mixer.Sound(path).get_raw()
+	return path, data, perf_counter() - start
+
+# main side
+def asset_paths(*paths, skip = ()):
+	# every image and sound file below paths, which may also be single files
+	files = []
+	for path in paths:
+		if os.path.isfile(path):
+			files.append(normpath(path))
+		for folder_path, _, file_names in os.walk(path):
+			files += [normpath(os.path.join(folder_path, file_name)) for file_name in file_names]
+	return [file for file in files if splitext(file)[1] in IMAGE_FORMATS + AUDIO_FORMATS and file not in skip]
+
+def preload_assets(paths, workers = None):
+	workers = workers or os.cpu_count() or 1
+	start = perf_counter()
+	if workers > 1 and len(paths) > 1:
+		pool = ProcessPoolExecutor(workers, get_context('spawn'), init_worker, (pygame.mixer.get_init(),))
+		with pool:
+			results = list(pool.map(decode_asset, paths, chunksize = max(1, len(paths) // (workers * 4))))
+	else:
+		results = [decode_asset(path) for path in paths]
+
+	# surfaces and sounds are created on the main thread by the importers
+	for path, data, seconds in results:
+		support.decoded_assets[path] = data
+		support.import_timings[path] = {'decode': seconds}
+	return perf_counter() - start
@@ -0,0 +1,72 @@
+from settings import *
+from weakref import WeakKeyDictionary
+
+class TextureAtlas:
+	def __init__(self, page_size = ATLAS_SIZE):
+		self.page_size = page_size
+		# page -> (image count, used area), pages are dropped once none of their frames are in use
+		self.pages = WeakKeyDictionary()
+
+	def surfaces(self, tree):
+		if isinstance(tree, pygame.Surface):
+			yield tree
+		else:
+			for value in (tree.values() if isinstance(tree, dict) else tree):
+				yield from self.surfaces(value)
+
+	def place(self, surfaces):
+		# next fit decreasing height: rows of images, a new page once a page is full
+		pages, rects = [[0, 0]], {}
+		x = y = shelf_height = 0
+		for surf in sorted(surfaces, key = lambda surf: surf.get_height(), reverse = True):
+			width, height = surf.get_size()
+			if x + width > self.page_size:
+				x, y, shelf_height = 0, y + shelf_height, 0
+			if y + height > self.page_size and (x or y):
+				pages.append([0, 0])
+				x = y = shelf_height = 0
+			rects[surf] = (len(pages) - 1, pygame.Rect(x, y, width, height))
+			pages[-1] = [max(pages[-1][0], x + width), max(pages[-1][1], y + height)]
+			x += width
+			shelf_height = max(shelf_height, height)
+		return pages, rects
+
+	def pack(self, tree):
+		# copies the surfaces in nested dicts and lists into shared pages and returns the same tree of subsurfaces
+		surfaces = list(dict.fromkeys(self.surfaces(tree)))
+		if not surfaces:
+			return tree
+		page_sizes, rects = self.place(surfaces)
+		pages = [pygame.Surface(size, pygame.SRCALPHA) for size in page_sizes]
+		counts = [[0, 0] for _ in pages]
+
+		frames = {}
+		for surf, (index, rect) in rects.items():
+			# colorkeys become transparent pixels, everything else is copied as it is
+			pages[index].blit(surf.convert_alpha(), rect, special_flags = pygame.BLEND_RGBA_MAX)
+			frames[surf] = pages[index].subsurface(rect)
+			counts[index][0] += 1
+			counts[index][1] += rect.width * rect.height
+		for page, (images, area) in zip(pages, counts):
+			self.pages[page] = (images, area)
+		return self.rebuild(tree, frames)
+
+	def rebuild(self, tree, frames):
+		if isinstance(tree, pygame.Surface):
+			return frames[tree]
+		if isinstance(tree, dict):
+			return {key: self.rebuild(value, frames) for key, value in tree.items()}
+		return [self.rebuild(value, frames) for value in tree]
+
+	def report(self):
+		pages = [{
+			'size': page.get_size(),
+			'images': images,
+			'occupancy': area / (page.get_width() * page.get_height())}
+			for page, (images, area) in self.pages.items()]
+		total = sum(page.get_width() * page.get_height() for page in self.pages)
+		return {
+			'pages': pages,
+			'images': sum(images for images, _ in self.pages.values()),
+			'bytes': total * 4,
+			'occupancy': sum(area for _, area in self.pages.values()) / total if total else 0}
@@ -0,0 +1,74 @@
+from settings import *
+from collections.abc import Mapping
+from support import load_sound
+
+class MusicPlayer:
+	# pygame.mixer.music streams one file at a time, so a track change fades the old track out and the new one in
+	def __init__(self, fade_ms):
+		self.fade_ms = fade_ms
+		self.current = None
+		self.queued = None
+		self.fade_end = 0
+
+	def play(self, path, loops):
+		# a track that played to its end is started again
+		if path == self.current and pygame.mixer.music.get_busy():
+			return
+		if pygame.mixer.music.get_busy():
+			if self.current:
+				pygame.mixer.music.fadeout(self.fade_ms)
+				self.fade_end = pygame.time.get_ticks() + self.fade_ms
+			self.current = None
+			self.queued = (path, loops)
+		else:
+			self.start(path, loops)
+
+	def stop(self, path):
+		if self.queued and self.queued[0] == path:
+			self.queued = None
+		if path == self.current:
+			pygame.mixer.music.fadeout(self.fade_ms)
+			self.fade_end = pygame.time.get_ticks() + self.fade_ms
+			self.current = None
+
+	def start(self, path, loops):
+		pygame.mixer.music.load(path)
+		pygame.mixer.music.play(loops, fade_ms = self.fade_ms)
+		self.current = path
+		self.queued = None
+
+	def update(self):
+		if self.queued and (pygame.time.get_ticks() >= self.fade_end or not pygame.mixer.music.get_busy()):
+			self.start(*self.queued)
+
+class MusicTrack:
+	# plays through the music player with the same calls as a pygame.mixer.Sound
+	def __init__(self, player, path):
+		self.player = player
+		self.path = path
+
+	def play(self, loops = 0):
+		self.player.play(self.path, loops)
+
+	def stop(self):
+		self.player.stop(self.path)
+
+class SoundBank(Mapping):
+	# music tracks are streamed, sound effects are loaded on first use
+	def __init__(self, paths, music_player, music_names = MUSIC_TRACKS):
+		self.paths = paths
+		self.sounds = {name: MusicTrack(music_player, path) for name, path in paths.items() if name in music_names}
+
+	def __getitem__(self, name):
+		if name not in self.sounds:
+			self.sounds[name] = load_sound(self.paths[name])
+		return self.sounds[name]
+
+	def __contains__(self, name):
+		return name in self.paths
+
+	def __iter__(self):
+		return iter(self.paths)
+
+	def __len__(self):
+		return len(self.paths)
@@ -3,8 +3,8 @@ from sprites import MonsterSprite, MonsterNameSprite, MonsterLevelSprite, Monste
 from groups import BattleSprites
 from game_data import ATTACK_DATA
 from support import draw_bar
-from timer import Timer # type: ignore
-from random import choice
+from derived import derived_surfaces, text_surfaces
+from battle_core import BattleState
 
 class Battle:
 	# main
@@ -14,21 +14,19 @@ class Battle:
 		self.bg_surf = bg_surf
 		self.monster_frames = monster_frames
 		self.fonts = fonts
-		self.monster_data = {'player': player_monsters, 'opponent': opponent_monsters}
 		self.battle_over = False
 		self.end_battle = end_battle
 		self.character = character
 		self.sounds = sounds
 
-		# timers 
-		self.timers = {
-			'opponent delay': Timer(600, func = self.opponent_attack)
-		}
+		# rules, the battle only shows what happens there
+		self.state = BattleState(player_monsters, opponent_monsters)
 
 		# groups
 		self.battle_sprites   = BattleSprites()
 		self.player_sprites   = pygame.sprite.Group()
 		self.opponent_sprites = pygame.sprite.Group()
+		self.monster_sprites  = {}
 
 		# control
 		self.current_monster = None
@@ -42,32 +40,28 @@ class Battle:
 			'switch' : 0,
 			'target' : 0,
 		}
+		# menu panels with the values they show, rebuilt when those change
+		self.menu_surfs = {}
 
-		self.setup()
-
-	def setup(self):
-		for entity, monster in self.monster_data.items():
-			for index, monster in {k:v for k,v in monster.items() if k <= 2}.items():
-				self.create_monster(monster, index, index, entity)
+		self.handle_events()
 
-			# remove opponent monster data 
-			for i in range(len(self.opponent_sprites)):
-				del self.monster_data['opponent'][i]
+	def get_pos(self, entity, pos_index):
+		return list(BATTLE_POSITIONS['left' if entity == 'player' else 'right'].values())[pos_index]
 
-	def create_monster(self, monster, index, pos_index, entity):
-		monster.paused = False
+	def create_monster(self, entity, pos_index):
+		index, monster = self.state.field[entity][pos_index]
+		pos = self.get_pos(entity, pos_index)
 		frames = self.monster_frames['monsters'][monster.name]
 		outline_frames = self.monster_frames['outlines'][monster.name]
 		if entity == 'player':
-			pos = list(BATTLE_POSITIONS['left'].values())[pos_index]
 			groups = (self.battle_sprites, self.player_sprites)
-			frames = {state: [pygame.transform.flip(frame, True, False) for frame in frames] for state, frames in frames.items()}
-			outline_frames = {state: [pygame.transform.flip(frame, True, False) for frame in frames] for state, frames in outline_frames.items()}
+			frames = {state: [derived_surfaces.get(frame, 'flip') for frame in frames] for state, frames in frames.items()}
+			outline_frames = {state: [derived_surfaces.get(frame, 'flip') for frame in frames] for state, frames in outline_frames.items()}
 		else:
-			pos = list(BATTLE_POSITIONS['right'].values())[pos_index]
 			groups = (self.battle_sprites, self.opponent_sprites)
 
-		monster_sprite = MonsterSprite(pos, frames, groups, monster, index, pos_index, entity, self.apply_attack, self.create_monster)
+		monster_sprite = MonsterSprite(pos, frames, groups, monster, index, pos_index, entity)
+		self.monster_sprites[(entity, pos_index)] = monster_sprite
 		MonsterOutlineSprite(monster_sprite, self.battle_sprites, outline_frames)
 
 		# ui
@@ -94,11 +88,9 @@ class Battle:
 			if keys[pygame.K_SPACE]:
 				
 				if self.selection_mode == 'switch':
-					index, new_monster = list(self.available_monsters.items())[self.indexes['switch']]
-					self.current_monster.kill()
-					self.create_monster(new_monster, index, self.current_monster.pos_index, 'player')
-					self.selection_mode = None
-					self.update_all_monsters('resume')
+					index = list(self.available_monsters)[self.indexes['switch']]
+					if self.state.step(('switch', index)):
+						self.current_monster, self.selection_mode = None, None
 
 				if self.selection_mode == 'target':
 					sprite_group = self.opponent_sprites if self.selection_side == 'opponent' else self.player_sprites
@@ -106,13 +98,11 @@ class Battle:
 					monster_sprite = sprites[list(sprites.keys())[self.indexes['target']]]
 
 					if self.selected_attack:
-						self.current_monster.activate_attack(monster_sprite, self.selected_attack)
-						self.selected_attack, self.current_monster, self.selection_mode = None, None, None
+						if self.state.step(('attack', self.selected_attack, (self.selection_side, monster_sprite.pos_index))):
+							self.selected_attack, self.current_monster, self.selection_mode = None, None, None
 					else:
-						if monster_sprite.monster.health < monster_sprite.monster.get_stat('max_health') * 0.9:
-							self.monster_data['player'][len(self.monster_data['player'])] = monster_sprite.monster
-							monster_sprite.delayed_kill(None)
-							self.update_all_monsters('resume')
+						if self.state.step(('catch', monster_sprite.pos_index)):
+							self.current_monster, self.selection_mode = None, None
 						else:
 							TimedSprite(monster_sprite.rect.center, self.monster_frames['ui']['cross'], self.battle_sprites, 1000)
 
@@ -126,10 +116,9 @@ class Battle:
 						self.selection_mode = 'attacks'
 					
 					if self.indexes['general'] == 1:
-						self.current_monster.monster.defending = True
-						self.update_all_monsters('resume')
-						self.current_monster, self.selection_mode = None, None
-						self.indexes['general'] = 0
+						if self.state.step(('defend',)):
+							self.current_monster, self.selection_mode = None, None
+							self.indexes['general'] = 0
 					
 					if self.indexes['general'] == 2:
 						self.selection_mode = 'switch'
@@ -143,100 +132,33 @@ class Battle:
 				if self.selection_mode in ('attacks', 'switch', 'target'):
 					self.selection_mode = 'general'
 
-	def update_timers(self):
-		for timer in self.timers.values():
-			timer.update()
-
-
-	# battle system
-	def check_active(self):
-		for monster_sprite in self.player_sprites.sprites() + self.opponent_sprites.sprites():
-			if monster_sprite.monster.initiative >= 100:
-				monster_sprite.monster.defending = False
-				self.update_all_monsters('pause')
-				monster_sprite.monster.initiative = 0
-				monster_sprite.set_highlight(True)
-				self.current_monster = monster_sprite
-				if self.player_sprites in monster_sprite.groups():
-					self.selection_mode = 'general'
-				else:
-					self.timers['opponent delay'].activate()
-
-	def update_all_monsters(self, option):
-		for monster_sprite in self.player_sprites.sprites() + self.opponent_sprites.sprites():
-			monster_sprite.monster.paused = True if option == 'pause' else False
-
-	def apply_attack(self, target_sprite, attack, amount):
-		AttackSprite(target_sprite.rect.center, self.monster_frames['attacks'][ATTACK_DATA[attack]['animation']], self.battle_sprites)
-		self.sounds[ATTACK_DATA[attack]['animation']].play()
-
-		# get correct attack damage amount (defense, element)
-		attack_element = ATTACK_DATA[attack]['element']
-		target_element = target_sprite.monster.element
-
-		# double attack
-		if attack_element == 'fire'  and target_element == 'plant' or \
-		   attack_element == 'water' and target_element == 'fire'  or \
-		   attack_element == 'plant' and target_element == 'water':
-			amount *= 2
-
-		# halve attack
-		if attack_element == 'fire'  and target_element == 'water' or \
-		   attack_element == 'water' and target_element == 'plant' or \
-		   attack_element == 'plant' and target_element == 'fire':
-			amount *= 0.5
-
-		target_defense = 1 - target_sprite.monster.get_stat('defense') / 2000
-		if target_sprite.monster.defending:
-			target_defense -= 0.2
-		target_defense = max(0, min(1, target_defense))
-
-		# update the monster health 
-		target_sprite.monster.health -= amount * target_defense
-		self.check_death()
-
-		# resume 
-		self.update_all_monsters('resume')
-
-	def check_death(self):
-		for monster_sprite in self.opponent_sprites.sprites() + self.player_sprites.sprites():
-			if monster_sprite.monster.health <= 0:
-				if self.player_sprites in monster_sprite.groups(): # player
-					active_monsters = [(monster_sprite.index, monster_sprite.monster) for monster_sprite in self.player_sprites.sprites()]
-					available_monsters = [(index, monster) for index, monster in self.monster_data['player'].items() if monster.health > 0 and (index, monster) not in active_monsters]
-					if available_monsters:
-						new_monster_data = [(monster, index, monster_sprite.pos_index, 'player') for index, monster in available_monsters][0]
-					else:
-						new_monster_data = None
-				else:
-					new_monster_data = (list(self.monster_data['opponent'].values())[0], monster_sprite.index, monster_sprite.pos_index, 'opponent') if self.monster_data['opponent'] else None
-					if self.monster_data['opponent']:
-						del self.monster_data['opponent'][min(self.monster_data['opponent'])]
-					# xp
-					xp_amount = monster_sprite.monster.level * 100 / len(self.player_sprites)
-					for player_sprite in self.player_sprites:
-						player_sprite.monster.update_xp(xp_amount)
-
-				monster_sprite.delayed_kill(new_monster_data)
-
-	def opponent_attack(self):
-		ability = choice(self.current_monster.monster.get_abilities())
-		random_target = choice(self.opponent_sprites.sprites()) if ATTACK_DATA[ability]['target'] == 'player' else choice(self.player_sprites.sprites())
-		self.current_monster.activate_attack(random_target, ability)
-
-	def check_end_battle(self):
-		# opponents have been defeated 
-		if len(self.opponent_sprites) == 0 and not self.battle_over:
-			self.battle_over = True
-			self.end_battle(self.character)
-			for monster in self. monster_data['player'].values():
-				monster.initiative = 0
-
-		# player has been defeated 
-		if len(self.player_sprites) == 0:
-			pygame.quit()
-			exit()
-
+	# battle events
+	def handle_events(self):
+		for event in self.state.pop_events():
+			match event:
+				case ('enter', entity, pos_index):
+					self.create_monster(entity, pos_index)
+				case ('leave', entity, pos_index):
+					self.monster_sprites.pop((entity, pos_index)).kill()
+				case ('turn', entity, pos_index):
+					monster_sprite = self.monster_sprites[(entity, pos_index)]
+					monster_sprite.set_highlight(True)
+					self.current_monster = monster_sprite
+					if entity == 'player':
+						self.selection_mode = 'general'
+				case ('attack', entity, pos_index, _, __, attack):
+					self.monster_sprites[(entity, pos_index)].activate_attack(attack)
+				case ('hit', entity, pos_index, attack, _):
+					AttackSprite(self.get_pos(entity, pos_index), self.monster_frames['attacks'][ATTACK_DATA[attack]['animation']], self.battle_sprites)
+					self.sounds[ATTACK_DATA[attack]['animation']].play()
+				case ('end', 'player'):
+					# opponents have been defeated
+					self.battle_over = True
+					self.end_battle(self.character)
+				case ('end', 'opponent'):
+					# player has been defeated
+					pygame.quit()
+					exit()
 
 	# ui 
 	def draw_ui(self):
@@ -253,7 +175,7 @@ class Battle:
 			if index == self.indexes['general']:
 				surf = self.monster_frames['ui'][f"{data_dict['icon']}_highlight"]
 			else:
-				surf = pygame.transform.grayscale(self.monster_frames['ui'][data_dict['icon']])
+				surf = derived_surfaces.get(self.monster_frames['ui'][data_dict['icon']], 'grayscale')
 			rect = surf.get_frect(center = self.current_monster.rect.midright + data_dict['pos'])
 			self.display_surface.blit(surf, rect)
 
@@ -261,13 +183,23 @@ class Battle:
 		# data
 		abilities = self.current_monster.monster.get_abilities(all = False)
 		width, height = 150, 200
+		bg_rect = pygame.FRect((0,0), (width,height)).move_to(midleft = self.current_monster.rect.midright + vector(20,0))
+
+		# the panel is only rebuilt when the list or the selection changes
+		key = (tuple(abilities), self.indexes['attacks'])
+		if self.menu_surfs.get('attacks', (None,))[0] != key:
+			self.menu_surfs['attacks'] = (key, self.create_attacks_panel(abilities, width, height))
+		self.display_surface.blit(self.menu_surfs['attacks'][1], bg_rect)
+
+	def create_attacks_panel(self, abilities, width, height):
+		panel_surf = pygame.Surface((width, height), pygame.SRCALPHA)
 		visible_attacks = 4
 		item_height = height / visible_attacks
 		v_offset = 0 if self.indexes['attacks'] < visible_attacks else -(self.indexes['attacks'] - visible_attacks + 1) * item_height
 
 		# bg
-		bg_rect = pygame.FRect((0,0), (width,height)).move_to(midleft = self.current_monster.rect.midright + vector(20,0))
-		pygame.draw.rect(self.display_surface, COLORS['white'], bg_rect, 0, 5)
+		bg_rect = pygame.FRect((0,0), (width,height))
+		pygame.draw.rect(panel_surf, COLORS['white'], bg_rect, 0, 5)
 
 		for index, ability in enumerate(abilities):
 			selected = index == self.indexes['attacks']
@@ -278,7 +210,7 @@ class Battle:
 				text_color = COLORS[element] if element!= 'normal' else COLORS['black']
 			else:
 				text_color = COLORS['light']
-			text_surf  = self.fonts['regular'].render(ability, False, text_color)
+			text_surf  = text_surfaces.render(self.fonts['regular'], ability, text_color)
 
 			# rect 
 			text_rect = text_surf.get_frect(center = bg_rect.midtop + vector(0, item_height / 2 + index * item_height + v_offset))
@@ -288,63 +220,69 @@ class Battle:
 			if bg_rect.collidepoint(text_rect.center):
 				if selected:
 					if text_bg_rect.collidepoint(bg_rect.topleft):
-						pygame.draw.rect(self.display_surface, COLORS['dark white'], text_bg_rect,0,0,5,5)
+						pygame.draw.rect(panel_surf, COLORS['dark white'], text_bg_rect,0,0,5,5)
 					elif text_bg_rect.collidepoint(bg_rect.midbottom + vector(0,-1)):
-						pygame.draw.rect(self.display_surface, COLORS['dark white'], text_bg_rect,0,0,0,0,5,5)
+						pygame.draw.rect(panel_surf, COLORS['dark white'], text_bg_rect,0,0,0,0,5,5)
 					else:
-						pygame.draw.rect(self.display_surface, COLORS['dark white'], text_bg_rect)
+						pygame.draw.rect(panel_surf, COLORS['dark white'], text_bg_rect)
 
-				self.display_surface.blit(text_surf, text_rect)
+				panel_surf.blit(text_surf, text_rect)
+		return panel_surf
 
 	def draw_switch(self):
 		# data 
 		width, height = 300, 320
+		bg_rect = pygame.FRect((0,0), (width, height)).move_to(midleft = self.current_monster.rect.midright + vector(20,0))
+		self.available_monsters = self.state.available('player')
+
+		# the panel is only rebuilt when a listed monster or the selection changes
+		key = (tuple((monster.name, monster.level, monster.health, monster.energy) for monster in self.available_monsters.values()), self.indexes['switch'])
+		if self.menu_surfs.get('switch', (None,))[0] != key:
+			self.menu_surfs['switch'] = (key, self.create_switch_panel(width, height))
+		self.display_surface.blit(self.menu_surfs['switch'][1], bg_rect)
+
+	def create_switch_panel(self, width, height):
+		panel_surf = pygame.Surface((width, height), pygame.SRCALPHA)
 		visible_monsters = 4
 		item_height = height / visible_monsters
 		v_offset = 0 if self.indexes['switch'] < visible_monsters else -(self.indexes['switch'] - visible_monsters + 1) * item_height
-		bg_rect = pygame.FRect((0,0), (width, height)).move_to(midleft = self.current_monster.rect.midright + vector(20,0))
-		pygame.draw.rect(self.display_surface, COLORS['white'], bg_rect, 0, 5)
+		bg_rect = pygame.FRect((0,0), (width, height))
+		pygame.draw.rect(panel_surf, COLORS['white'], bg_rect, 0, 5)
 
 		# monsters 
-		active_monsters = [(monster_sprite.index, monster_sprite.monster) for monster_sprite in self.player_sprites]
-		self.available_monsters = {index: monster for index, monster in self.monster_data['player'].items() if (index, monster) not in active_monsters and monster.health > 0}
-
 		for index, monster in enumerate(self.available_monsters.values()):
 			selected = index == self.indexes['switch']
 			item_bg_rect = pygame.FRect((0,0), (width, item_height)).move_to(midleft = (bg_rect.left, bg_rect.top + item_height / 2 + index * item_height + v_offset))
 
 			icon_surf = self.monster_frames['icons'][monster.name]
 			icon_rect = icon_surf.get_frect(midleft = bg_rect.topleft + vector(10,item_height / 2 + index * item_height + v_offset))
-			text_surf = self.fonts['regular'].render(f'{monster.name} ({monster.level})', False, COLORS['red'] if selected else COLORS['black'])
+			text_surf = text_surfaces.render(self.fonts['regular'], f'{monster.name} ({monster.level})', COLORS['red'] if selected else COLORS['black'])
 			text_rect = text_surf.get_frect(topleft = (bg_rect.left + 90, icon_rect.top))
 
 			# selection bg
 			if selected:
 				if item_bg_rect.collidepoint(bg_rect.topleft):
-					pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect, 0, 0, 5, 5)
+					pygame.draw.rect(panel_surf, COLORS['dark white'], item_bg_rect, 0, 0, 5, 5)
 				elif item_bg_rect.collidepoint(bg_rect.midbottom + vector(0,-1)):
-					pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect, 0, 0, 0, 0, 5, 5)
+					pygame.draw.rect(panel_surf, COLORS['dark white'], item_bg_rect, 0, 0, 0, 0, 5, 5)
 				else:
-					pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect)
+					pygame.draw.rect(panel_surf, COLORS['dark white'], item_bg_rect)
 
 			if bg_rect.collidepoint(item_bg_rect.center):
 				for surf, rect in ((icon_surf, icon_rect), (text_surf, text_rect)):
-					self.display_surface.blit(surf, rect)
+					panel_surf.blit(surf, rect)
 				health_rect = pygame.FRect((text_rect.bottomleft + vector(0,4)), (100,4))
 				energy_rect = pygame.FRect((health_rect.bottomleft + vector(0,2)), (80,4))
-				draw_bar(self.display_surface, health_rect, monster.health, monster.get_stat('max_health'), COLORS['red'], COLORS['black'])
-				draw_bar(self.display_surface, energy_rect, monster.energy, monster.get_stat('max_energy'), COLORS['blue'], COLORS['black'])
+				draw_bar(panel_surf, health_rect, monster.health, monster.get_stat('max_health'), COLORS['red'], COLORS['black'])
+				draw_bar(panel_surf, energy_rect, monster.energy, monster.get_stat('max_energy'), COLORS['blue'], COLORS['black'])
+		return panel_surf
 
 	def update(self, dt):
-		self.check_end_battle()
-		
-		# updates
-		self.input()
-		self.update_timers()
+		self.state.advance(dt)
+		self.handle_events()
 		self.battle_sprites.update(dt)
-		self.check_active()
 
-		# drawing
+	def draw(self):
 		self.display_surface.blit(self.bg_surf, (0,0))
 		self.battle_sprites.draw(self.current_monster, self.selection_side, self.selection_mode, self.indexes['target'], self.player_sprites, self.opponent_sprites)
 		self.draw_ui()
\ No newline at end of file
@@ -0,0 +1,230 @@
+from game_data import ATTACK_DATA
+from damage_model import damage
+import random
+
+# seconds, matching the battle view: 4 attack frames at ANIMATION_SPEED, the 'kill' and 'opponent delay' timers
+ATTACK_TIME = 4 / 6
+FAINT_TIME = 0.6
+OPPONENT_DELAY = 0.6
+
+SIDES = ('player', 'opponent')
+FIELD_SIZE = 3
+
+class BattleState:
+	def __init__(self, player_monsters, opponent_monsters, rng = random):
+		# rosters by index, the opponent one only keeps the monsters that have not entered yet
+		self.monsters = {'player': player_monsters, 'opponent': opponent_monsters}
+		# position -> (roster index, monster) for the monsters on the field
+		self.field = {side: {} for side in SIDES}
+		self.rng = rng
+		self.time = 0
+
+		# (side, position) of the monster choosing an action
+		self.current = None
+		self.opponent_time = None
+		# attacks waiting for their animation to finish and fainted monsters about to leave
+		self.attacks = []
+		self.fainting = {}
+		self.winner = None
+
+		# what happened since the view last looked
+		self.events = []
+
+		for side in SIDES:
+			for index, monster in [(index, monster) for index, monster in self.monsters[side].items() if index < FIELD_SIZE]:
+				self.enter(side, index, index, monster)
+		for index, _ in self.field['opponent'].values():
+			del self.monsters['opponent'][index]
+
+	@property
+	def paused(self):
+		# initiative only builds up while nobody is choosing or attacking
+		return self.current is not None or bool(self.attacks)
+
+	def pop_events(self):
+		events, self.events = self.events, []
+		return events
+
+	def monster(self, side, pos):
+		return self.field[side][pos][1]
+
+	def available(self, side):
+		# monsters that could be switched in
+		active = [monster for _, monster in self.field[side].values()]
+		active += [replacement[1] for _, replacement in self.fainting.values() if replacement]
+		return {index: monster for index, monster in self.monsters[side].items() if monster.health > 0 and monster not in active}
+
+	# changes
+	def enter(self, side, pos, index, monster):
+		self.field[side][pos] = (index, monster)
+		self.events.append(('enter', side, pos))
+
+	def leave(self, side, pos):
+		del self.field[side][pos]
+		if self.current == (side, pos):
+			self.current = None
+		self.events.append(('leave', side, pos))
+
+	def start_attack(self, side, pos, attack, target_side, target_pos):
+		attacker = self.monster(side, pos)
+		attacker.reduce_energy(attack)
+		self.attacks.append((self.time + ATTACK_TIME, side, pos, attacker, target_side, target_pos, self.monster(target_side, target_pos), attack))
+		self.current = None
+		self.events.append(('attack', side, pos, target_side, target_pos, attack))
+
+	def land_attack(self, side, pos, attacker, target_side, target_pos, target, attack):
+		# attackers that left the field before their animation finished miss
+		if self.field[side].get(pos, (None, None))[1] is not attacker:
+			return
+		amount = damage(attacker, attack, target, target.defending)
+		target.health -= amount
+		self.events.append(('hit', target_side, target_pos, attack, amount))
+		self.check_faint()
+
+	def check_faint(self):
+		for side in reversed(SIDES):
+			for pos, (index, monster) in self.field[side].items():
+				if monster.health <= 0 and (side, pos) not in self.fainting:
+					if side == 'player':
+						replacement = next(iter(self.available('player').items()), None)
+					else:
+						reserve = self.monsters['opponent']
+						replacement = (min(reserve), reserve.pop(min(reserve))) if reserve else None
+						# xp
+						xp_amount = monster.level * 100 / len(self.field['player'])
+						for _, player_monster in self.field['player'].values():
+							player_monster.update_xp(xp_amount)
+					self.fainting[(side, pos)] = (self.time + FAINT_TIME, replacement)
+					self.events.append(('faint', side, pos))
+
+	def check_turn(self):
+		for side in SIDES:
+			for pos, (_, monster) in self.field[side].items():
+				if monster.initiative >= 100 and (side, pos) not in self.fainting:
+					monster.defending = False
+					monster.initiative = 0
+					self.current = (side, pos)
+					if side == 'opponent':
+						self.opponent_time = self.time + OPPONENT_DELAY
+					self.events.append(('turn', side, pos))
+					return
+
+	def opponent_action(self):
+		side, pos = self.current
+		ability = self.rng.choice(self.monster(side, pos).get_abilities())
+		target_side = 'opponent' if ATTACK_DATA[ability]['target'] == 'player' else 'player'
+		self.start_attack(side, pos, ability, target_side, self.rng.choice(list(self.field[target_side])))
+
+	def check_end(self):
+		# opponents have been defeated
+		if not self.field['opponent']:
+			self.winner = 'player'
+			for monster in self.monsters['player'].values():
+				monster.initiative = 0
+		# player has been defeated
+		elif not self.field['player']:
+			self.winner = 'opponent'
+		if self.winner:
+			self.events.append(('end', self.winner))
+
+	def next_event(self):
+		# seconds until something happens, so simulations can skip ahead
+		times = [end_time for end_time, _ in self.fainting.values()]
+		if self.attacks:
+			times.append(self.attacks[0][0])
+		if self.current and self.current[0] == 'opponent':
+			times.append(self.opponent_time)
+		delays = [time - self.time for time in times]
+		if not self.paused:
+			for side in SIDES:
+				delays += [(100 - monster.initiative) / monster.get_stat('speed') for pos, (_, monster) in self.field[side].items() if (side, pos) not in self.fainting]
+		return max(0, min(delays, default = 0))
+
+	# control
+	def step(self, action):
+		# the player's choice for the current monster:
+		# ('attack', attack, (side, pos)), ('defend',), ('switch', index) or ('catch', pos)
+		# returns False if the action is not possible
+		if self.winner or not self.current or self.current[0] != 'player':
+			return False
+		side, pos = self.current
+		monster = self.monster(side, pos)
+
+		match action:
+			case ('attack', attack, (target_side, target_pos)):
+				if target_pos not in self.field[target_side]:
+					return False
+				self.start_attack(side, pos, attack, target_side, target_pos)
+			case ('defend',):
+				monster.defending = True
+				self.current = None
+			case ('switch', index):
+				if index not in self.available(side):
+					return False
+				self.leave(side, pos)
+				self.enter(side, pos, index, self.monsters[side][index])
+			case ('catch', target_pos):
+				target = self.field['opponent'].get(target_pos, (None, None))[1]
+				if not target or (('opponent', target_pos) in self.fainting) or target.health >= target.get_stat('max_health') * 0.9:
+					return False
+				self.monsters['player'][len(self.monsters['player'])] = target
+				self.fainting[('opponent', target_pos)] = (self.time + FAINT_TIME, None)
+				self.current = None
+				self.events.append(('caught', 'opponent', target_pos))
+			case _:
+				raise ValueError(f'unknown battle action {action!r}')
+		return True
+
+	def advance(self, dt):
+		if self.winner:
+			return
+		self.time += dt
+		# initiative does not build up during a step that started paused
+		was_paused = self.paused
+
+		if self.current and self.current[0] == 'opponent' and self.time >= self.opponent_time:
+			self.opponent_action()
+
+		# attacks land once their animation is over
+		while self.attacks and self.attacks[0][0] <= self.time:
+			self.land_attack(*self.attacks.pop(0)[1:])
+
+		# fainted monsters leave the field and the next one enters
+		for (side, pos), (end_time, replacement) in list(self.fainting.items()):
+			if end_time <= self.time:
+				del self.fainting[(side, pos)]
+				self.leave(side, pos)
+				if replacement:
+					self.enter(side, pos, *replacement)
+		self.check_end()
+		if self.winner:
+			return
+
+		for side in SIDES:
+			for _, monster in self.field[side].values():
+				if not self.paused and not was_paused:
+					monster.initiative += monster.get_stat('speed') * dt
+				monster.stat_limiter()
+
+		if not self.paused:
+			self.check_turn()
+
+# balancing and regression runs without the view
+def auto_action(state):
+	# the first affordable attack on a random target, otherwise defend
+	side, pos = state.current
+	abilities = state.monster(side, pos).get_abilities(all = False)
+	if not abilities:
+		return ('defend',)
+	target_side = 'opponent' if ATTACK_DATA[abilities[0]]['target'] == 'opponent' else 'player'
+	return ('attack', abilities[0], (target_side, state.rng.choice(list(state.field[target_side]))))
+
+def simulate(player_monsters, opponent_monsters, choose = auto_action, max_time = 600, rng = random):
+	# jumps from one event to the next instead of ticking at a frame rate
+	state = BattleState(player_monsters, opponent_monsters, rng)
+	while not state.winner and state.time < max_time:
+		if state.current and state.current[0] == 'player':
+			state.step(choose(state))
+		state.advance(state.next_event() + 1e-9)
+		state.events.clear()
+	return state
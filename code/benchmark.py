@@ -0,0 +1,198 @@
+import os
+# run without a display or sound card
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import json
+import random
+import subprocess
+from collections import deque
+from argparse import ArgumentParser
+from time import perf_counter
+
+from main import Game
+from settings import *
+from game_data import MONSTER_DATA
+from battle import Battle
+from battle_core import auto_action
+from evolution import Evolution
+from monster import Monster
+import support
+
+# scripted scenes
+def heal_monsters(game):
+    for monster in game.player_monsters.values():
+        monster.health = monster.get_stat('max_health')
+        monster.energy = monster.get_stat('max_energy')
+
+def drive_player(game, direction):
+    # replaces keyboard input with a fixed direction
+    game.player.input = lambda: None
+    if not game.player.blocked:
+        game.player.direction = vector(direction)
+
+def auto_play(battle):
+    # picks the first affordable attack for the player, otherwise defends
+    if battle.selection_mode and battle.current_monster:
+        battle.state.step(auto_action(battle.state))
+        battle.current_monster, battle.selection_mode = None, None
+
+def start_overworld(game):
+    # every scene starts from a freshly built map
+    game.scenes.clear()
+    game.setup(game.tmx_maps['world'], 'house')
+
+# from the house on world across four terrain chunks and ten culling grid cells,
+# clear of grass, transitions and the trainers' view
+WALK_ROUTE = ((4304, 3664), (4304, 3792), (4368, 3792), (4368, 3824), (4560, 3824), (4560, 3856), (4592, 3856),
+              (4592, 4208), (3728, 4208), (3728, 4240), (3568, 4240), (3568, 4208), (3312, 4208), (3312, 4080))
+
+def start_walk(game):
+    start_overworld(game)
+    # out along the route and back to the house, then again
+    game.walk_route = deque(WALK_ROUTE + WALK_ROUTE[-2::-1] + (tuple(game.player.rect.center),))
+
+def walk_overworld(game, frame):
+    # heads for the next waypoint one axis at a time
+    offset = vector(game.walk_route[0]) - game.player.rect.center
+    if abs(offset.x) <= 2.5 and abs(offset.y) <= 2.5:
+        game.walk_route.rotate(-1)
+        offset = vector(game.walk_route[0]) - game.player.rect.center
+    if abs(offset.x) > 2.5:
+        drive_player(game, (1 if offset.x > 0 else -1, 0))
+    else:
+        drive_player(game, (0, 1 if offset.y > 0 else -1))
+
+def start_wild_battle(game):
+    start_overworld(game)
+    heal_monsters(game)
+    game.player.block()
+    opponents = {index: Monster(name, level) for index, (name, level) in enumerate((('Finsta', 15), ('Pouch', 13), ('Larvea', 12)))}
+    game.battle = Battle(game.player_monsters, opponents, game.monster_frames, game.bg_frames['forest'], game.fonts, game.end_battle, None, game.audio)
+
+def start_trainer_battle(game):
+    start_overworld(game)
+    heal_monsters(game)
+    game.player.block()
+    character = next(character for character in game.character_sprites if character.monsters and not character.nurse)
+    game.battle = Battle(game.player_monsters, character.monsters, game.monster_frames, game.bg_frames[character.character_data['biome']], game.fonts, game.end_battle, character, game.audio)
+
+def play_battle(game, frame):
+    if game.battle:
+        auto_play(game.battle)
+
+def start_monster_index(game):
+    start_overworld(game)
+    game.index_open = True
+    game.player.block()
+
+def start_evolution(game):
+    start_overworld(game)
+    game.player.block()
+    name = next(name for name, data in MONSTER_DATA.items() if data['evolve'])
+    game.evolution = Evolution(game.monster_frames['monsters'], name, MONSTER_DATA[name]['evolve'][0], game.fonts['bold'], game.end_evolution, game.start_animation_frames)
+
+def repeat_evolution(game, frame):
+    if not game.evolution:
+        start_evolution(game)
+
+SCENES = {
+    'overworld': (start_walk, walk_overworld),
+    'wild battle': (start_wild_battle, play_battle),
+    'trainer battle': (start_trainer_battle, play_battle),
+    'monster index': (start_monster_index, lambda game, frame: None),
+    'evolution': (start_evolution, repeat_evolution),
+}
+
+# measurement
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+def summary(values):
+    values = [value * 1000 for value in values] # ms
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
+
+def run_scene(game, scene, frames):
+    start, script = SCENES[scene]
+    start(game)
+    dt = 1 / TICK_RATE
+    update_times, draw_times = [], []
+    for frame in range(frames):
+        pygame.event.pump()
+        script(game, frame)
+
+        start_time = perf_counter()
+        game.read_input()
+        game.simulate(dt)
+        update_time = perf_counter()
+        game.display_surface.fill('black')
+        game.render(dt)
+        pygame.display.update()
+        draw_time = perf_counter()
+
+        update_times.append(update_time - start_time)
+        draw_times.append(draw_time - update_time)
+
+    # leave no overlay behind for the next scene
+    game.battle, game.evolution, game.dialog_tree, game.index_open = None, None, None, False
+    game.transition_target, game.tint_mode, game.tint_progress = None, 'untint', 0
+    return {
+        'update': summary(update_times),
+        'draw': summary(draw_times),
+        'frame': summary([update + draw for update, draw in zip(update_times, draw_times)]),
+    }
+
+def startup_summary(seconds, import_time, count = 10):
+    # total start up time, the parallel decode wall time and the assets that took longest to import
+    timings = sorted(support.import_timings.items(), key = lambda item: sum(item[1].values()), reverse = True)
+    return {
+        'seconds': seconds,
+        'parallel_import': import_time,
+        'slowest': {path: {phase: time * 1000 for phase, time in phases.items()} for path, phases in timings[:count]}, # ms
+    }
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = ArgumentParser(description = 'headless frame time benchmark')
+    parser.add_argument('--frames', type = int, default = 600)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--scenes', nargs = '+', choices = list(SCENES), default = list(SCENES))
+    parser.add_argument('--output', help = 'json file for the results (default: stdout)')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    start_time = perf_counter()
+    game = Game()
+    startup = perf_counter() - start_time
+    results = {
+        'commit': current_commit(),
+        'seed': args.seed,
+        'frames': args.frames,
+        'tick_rate': TICK_RATE,
+        'startup': startup_summary(startup, game.import_time),
+        'atlas': game.atlas.report() if game.atlas else None,
+        'chunk_memory': sum(game.chunk_memory.values()), # bytes of baked terrain on the start map
+        'scenes': {scene: run_scene(game, scene, args.frames) for scene in args.scenes},
+    }
+    pygame.quit()
+
+    report = json.dumps(results, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+from game_data import MONSTER_DATA, ATTACK_DATA, ELEMENT_DATA
+from array import array
+
+# names interned as small integer ids, in game_data order
+ELEMENTS = tuple(ELEMENT_DATA)
+ELEMENT_IDS = {element: index for index, element in enumerate(ELEMENTS)}
+ATTACKS = tuple(ATTACK_DATA)
+ATTACK_IDS = {attack: index for index, attack in enumerate(ATTACKS)}
+SPECIES = tuple(MONSTER_DATA)
+SPECIES_IDS = {name: index for index, name in enumerate(SPECIES)}
+
+# effectiveness[attack element * element count + target element]
+EFFECTIVENESS = array('d', [ELEMENT_DATA[attack_element].get(target_element, 1) for attack_element in ELEMENTS for target_element in ELEMENTS])
+
+# per attack
+ATTACK_AMOUNTS = array('d', [ATTACK_DATA[attack]['amount'] for attack in ATTACKS])
+ATTACK_COSTS = array('d', [ATTACK_DATA[attack]['cost'] for attack in ATTACKS])
+ATTACK_ELEMENTS = array('B', [ELEMENT_IDS[ATTACK_DATA[attack]['element']] for attack in ATTACKS])
+ATTACK_ON_SELF = array('B', [ATTACK_DATA[attack]['target'] == 'player' for attack in ATTACKS])
+
+# per species
+SPECIES_ELEMENTS = array('B', [ELEMENT_IDS[MONSTER_DATA[name]['stats']['element']] for name in SPECIES])
+
+# one row per (species, level) with the stats and the share of damage that gets through defense
+STAT_NAMES = ('max_health', 'max_energy', 'attack', 'defense', 'recovery', 'speed')
+STAT_COLUMNS = {stat: index for index, stat in enumerate(STAT_NAMES + ('guard',))}
+STAT_COUNT = len(STAT_COLUMNS)
+ATTACK, GUARD = STAT_COLUMNS['attack'], STAT_COLUMNS['guard']
+stat_rows = array('d')
+max_level = -1
+
+def build_stat_rows(level):
+	# rows are laid out species by species, so the whole table grows at once
+	global stat_rows, max_level
+	max_level = level
+	rows = []
+	for name in SPECIES:
+		stats = MONSTER_DATA[name]['stats']
+		for row_level in range(max_level + 1):
+			rows += [stats[stat] * row_level for stat in STAT_NAMES]
+			rows.append(1 - stats['defense'] * row_level / 2000)
+	stat_rows = array('d', rows)
+
+def ensure_level(level):
+	# grows the table so it has rows up to level
+	if level > max_level:
+		build_stat_rows(level * 2)
+
+def damage(attacker, attack, target, defending):
+	# attacker and target are monsters, attack is an attack name
+	attack_id = ATTACK_IDS[attack]
+	target_id = SPECIES_IDS[target.name]
+	ensure_level(attacker.level if attacker.level > target.level else target.level)
+	attacker_row = (SPECIES_IDS[attacker.name] * (max_level + 1) + attacker.level) * STAT_COUNT
+	target_row = (target_id * (max_level + 1) + target.level) * STAT_COUNT
+
+	multiplier = EFFECTIVENESS[ATTACK_ELEMENTS[attack_id] * len(ELEMENTS) + SPECIES_ELEMENTS[target_id]]
+	defense = stat_rows[target_row + GUARD] - 0.2 * defending
+	defense = 0 if defense < 0 else 1 if defense > 1 else defense
+	return stat_rows[attacker_row + ATTACK] * ATTACK_AMOUNTS[attack_id] * multiplier * defense
+
+build_stat_rows(100)
@@ -1,4 +1,6 @@
 import pygame
+from collections import deque
+from time import perf_counter
 pygame.init()
 font = pygame.font.Font(None,30)
 
@@ -8,3 +10,73 @@ def debug(info,y = 10, x = 10):
 	debug_rect = debug_surf.get_rect(topleft = (x,y))
 	pygame.draw.rect(display_surface,'Black',debug_rect)
 	display_surface.blit(debug_surf,debug_rect)
+
+class Profiler:
+	def __init__(self, samples = 120):
+		self.active = False
+		self.samples = samples
+		self.font = pygame.font.Font(None,20)
+
+		# seconds spent in each phase, per frame
+		self.timings = {}
+		self.frame_timings = {}
+		self.frame_times = deque(maxlen = samples)
+		self.counts = {}
+		self.frame_start = self.last_mark = 0
+
+	def toggle(self):
+		self.active = not self.active
+		self.timings.clear()
+		self.frame_timings.clear()
+		self.frame_times.clear()
+		self.counts.clear()
+		# toggled mid frame, so the first frame is timed from here
+		self.frame_start = self.last_mark = perf_counter()
+
+	def begin(self):
+		if self.active:
+			self.frame_start = self.last_mark = perf_counter()
+
+	def mark(self, phase):
+		# time since the previous mark is added to the phase
+		if self.active:
+			now = perf_counter()
+			self.frame_timings[phase] = self.frame_timings.get(phase, 0) + now - self.last_mark
+			self.last_mark = now
+
+	def count(self, name, value):
+		if self.active:
+			self.counts[name] = value
+
+	def end(self):
+		if self.active:
+			for phase, time in self.frame_timings.items():
+				if phase not in self.timings:
+					self.timings[phase] = deque(maxlen = self.samples)
+				self.timings[phase].append(time)
+			self.frame_timings.clear()
+			self.frame_times.append(perf_counter() - self.frame_start)
+
+	def draw(self):
+		if not self.active or not self.frame_times:
+			return
+		display_surface = pygame.display.get_surface()
+		lines = [f'frame: {sum(self.frame_times) / len(self.frame_times) * 1000:.2f} ms']
+		lines += [f'{phase}: {sum(times) / len(times) * 1000:.2f} ms' for phase, times in self.timings.items()]
+		lines += [f'{name}: {value}' for name, value in self.counts.items()]
+
+		# text
+		y = 10
+		for line in lines:
+			text_surf = self.font.render(line,True,'White')
+			text_rect = text_surf.get_rect(topleft = (10,y))
+			pygame.draw.rect(display_surface,'Black',text_rect)
+			display_surface.blit(text_surf,text_rect)
+			y += text_rect.height
+
+		# frame time graph, the top of the graph is 1/30 s
+		graph_rect = pygame.Rect(10,y + 10,self.samples * 2,60)
+		pygame.draw.rect(display_surface,'Black',graph_rect)
+		if len(self.frame_times) > 1:
+			points = [(graph_rect.left + index * 2, graph_rect.bottom - min(1, time * 30) * graph_rect.height) for index, time in enumerate(self.frame_times)]
+			pygame.draw.lines(display_surface,'White',False,points)
\ No newline at end of file
@@ -0,0 +1,59 @@
+from settings import *
+from collections import OrderedDict
+
+def white_silhouette(surf):
+	white_surf = pygame.mask.from_surface(surf).to_surface()
+	white_surf.set_colorkey('black')
+	return white_surf
+
+TRANSFORMS = {
+	'flip': lambda surf: pygame.transform.flip(surf, True, False),
+	'grayscale': pygame.transform.grayscale,
+	'scale2x': pygame.transform.scale2x,
+	'white': white_silhouette,
+}
+
+class DerivedSurfaces:
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.size = 0
+		# (source surface, transform chain) -> surface, least recently used first
+		self.surfaces = OrderedDict()
+
+	def get(self, surf, *chain):
+		key = (surf, chain)
+		if key in self.surfaces:
+			self.surfaces.move_to_end(key)
+			return self.surfaces[key]
+
+		# every step of the chain is cached, so chains sharing a prefix share the work
+		source = self.get(surf, *chain[:-1]) if len(chain) > 1 else surf
+		derived_surf = TRANSFORMS[chain[-1]](source)
+		self.surfaces[key] = derived_surf
+		self.size += derived_surf.get_width() * derived_surf.get_height() * derived_surf.get_bytesize()
+		while self.size > self.max_bytes and len(self.surfaces) > 1:
+			_, old_surf = self.surfaces.popitem(last = False)
+			self.size -= old_surf.get_width() * old_surf.get_height() * old_surf.get_bytesize()
+		return derived_surf
+
+class TextSurfaces:
+	def __init__(self, max_count):
+		self.max_count = max_count
+		# (font, text, color) -> surface, least recently used first
+		self.surfaces = OrderedDict()
+
+	def render(self, font, text, color):
+		key = (font, text, color)
+		if key in self.surfaces:
+			self.surfaces.move_to_end(key)
+			return self.surfaces[key]
+
+		text_surf = font.render(text, False, color)
+		self.surfaces[key] = text_surf
+		if len(self.surfaces) > self.max_count:
+			self.surfaces.popitem(last = False)
+		return text_surf
+
+# shared by battles, battle sprites and evolutions
+derived_surfaces = DerivedSurfaces(DERIVED_CACHE_BYTES)
+text_surfaces = TextSurfaces(TEXT_CACHE_SIZE)
@@ -1,5 +1,5 @@
 from settings import * 
-from support import check_connections
+from support import vision_cells, check_connections
 from timer import Timer # type: ignore
 from random import choice
 from monster import Monster
@@ -24,6 +24,11 @@ class Entity(pygame.sprite.Sprite):
 		self.hitbox = self.rect.inflate(-self.rect.width / 2, -60)
 
 		self.y_sort = self.rect.centery
+		self.previous_pos = vector(self.rect.topleft)
+
+	def get_render_pos(self, alpha):
+		# position between the last two simulation steps
+		return self.previous_pos.lerp(self.rect.topleft, alpha)
 
 	def animate(self, dt):
 		self.frame_index += ANIMATION_SPEED * dt
@@ -58,7 +63,7 @@ class Character(Entity):
 		self.character_data = character_data
 		self.player = player
 		self.create_dialog = create_dialog
-		self.collision_rects = [sprite.rect for sprite in collision_sprites if sprite is not self]
+		self.collision_sprites = collision_sprites
 		self.nurse = nurse
 		self.monsters = {i: Monster(name, lvl) for i, (name, lvl) in character_data['monsters'].items()} if 'monsters' in character_data else None
 
@@ -68,6 +73,9 @@ class Character(Entity):
 		self.has_noticed = False
 		self.radius = int(radius)
 		self.view_directions = character_data['directions']
+		# vision cells and blocking rects for each facing direction, from where the character stands
+		self.vision = {}
+		self.vision_key = None
 
 		self.timers = {
 			'look around': Timer(1500, autostart = True, repeat = True, func = self.random_view_direction),
@@ -83,7 +91,7 @@ class Character(Entity):
 		return self.character_data['dialog'][f"{'defeated' if self.character_data['defeated'] else 'default'}"]
 
 	def raycast(self):
-		if check_connections(self.radius, self, self.player) and self.has_los() and not self.has_moved and not self.has_noticed:
+		if not self.has_moved and not self.has_noticed and self.can_see_player():
 			self.player.block()
 			self.player.change_facing_direction(self.rect.center)
 			self.timers['notice'].activate()
@@ -92,10 +100,27 @@ class Character(Entity):
 			self.player.noticed = True
 			self.notice_sound.play()
 
-	def has_los(self):
-		if vector(self.rect.center).distance_to(self.player.rect.center) < self.radius:
-			collisions = [bool(rect.clipline(self.rect.center, self.player.rect.center)) for rect in self.collision_rects]
-			return not any(collisions)
+	def build_vision(self, direction):
+		collision_rects = [sprite.rect for sprite in self.collision_sprites if sprite is not self]
+		self.vision[direction] = vision_cells(self.rect.center, self.radius, direction, collision_rects, VISION_CELL_SIZE)
+
+	def can_see_player(self):
+		# rebuilt after the collision layout changed or the character moved
+		vision_key = (self.collision_sprites.version, tuple(self.rect.center))
+		if self.vision_key != vision_key:
+			self.vision.clear()
+			for direction in self.view_directions:
+				self.build_vision(direction)
+			self.vision_key = vision_key
+		if self.facing_direction not in self.vision:
+			self.build_vision(self.facing_direction)
+
+		# the cells only rule out a player far from the view, the exact checks decide
+		cells, blocking_rects = self.vision[self.facing_direction]
+		cell = (int(self.player.rect.centerx // VISION_CELL_SIZE), int(self.player.rect.centery // VISION_CELL_SIZE))
+		if cell not in cells or not check_connections(self.radius, self, self.player):
+			return False
+		return not any(rect.clipline(self.rect.center, self.player.rect.center) for rect in blocking_rects)
 
 	def start_move(self):
 		relation = (vector(self.player.rect.center) - vector(self.rect.center)).normalize()
@@ -141,16 +166,19 @@ class Player(Entity):
 		self.direction = input_vector.normalize() if input_vector else input_vector
 
 	def move(self, dt):
+		start_hitbox = self.hitbox.copy()
 		self.rect.centerx += self.direction.x * self.speed * dt
 		self.hitbox.centerx = self.rect.centerx
-		self.collisions('horizontal')
+		self.collisions('horizontal', start_hitbox.union(self.hitbox))
 
+		start_hitbox = self.hitbox.copy()
 		self.rect.centery += self.direction.y * self.speed * dt
 		self.hitbox.centery = self.rect.centery
-		self.collisions('vertical')
+		self.collisions('vertical', start_hitbox.union(self.hitbox))
 
-	def collisions(self, axis):
-		for sprite in self.collision_sprites:
+	def collisions(self, axis, swept_hitbox):
+		# only test the sprites around the area swept by this move
+		for sprite in self.collision_sprites.near(swept_hitbox):
 			if sprite.hitbox.colliderect(self.hitbox):
 				if axis == 'horizontal':
 					if self.direction.x > 0: 
@@ -1,27 +1,27 @@
 from settings import * 
 from timer import Timer # type: ignore
+from derived import derived_surfaces
 
 class Evolution:
 	def __init__(self, frames, start_monster, end_monster, font, end_evolution, star_frames):
 		self.display_surface = pygame.display.get_surface()
-		self.start_monster_surf = pygame.transform.scale2x(frames[start_monster]['idle'][0])
-		self.end_monster_surf = pygame.transform.scale2x(frames[end_monster]['idle'][0])
+		self.start_monster_surf = derived_surfaces.get(frames[start_monster]['idle'][0], 'scale2x')
+		self.end_monster_surf = derived_surfaces.get(frames[end_monster]['idle'][0], 'scale2x')
 		self.timers = {
 			'start': Timer(800, autostart = True),
 			'end': Timer(1800, func = end_evolution)
 		}
 
 		# star animation
-		self.star_frames = [pygame.transform.scale2x(frame) for frame in star_frames]
+		self.star_frames = [derived_surfaces.get(frame, 'scale2x') for frame in star_frames]
 		self.frame_index = 0
 
 		# screen tint
 		self.tint_surf = pygame.Surface(self.display_surface.get_size())
 		self.tint_surf.set_alpha(200)
 
-		# white tint 
-		self.start_monster_surf_white = pygame.mask.from_surface(self.start_monster_surf).to_surface()
-		self.start_monster_surf_white.set_colorkey('black')
+		# white tint, a copy of the cached surface so the alpha does not leak to its other users
+		self.start_monster_surf_white = derived_surfaces.get(frames[start_monster]['idle'][0], 'scale2x', 'white').copy()
 		self.tint_amount, self.tint_speed = 0, 80
 		self.start_monster_surf_white.set_alpha(self.tint_amount)
 
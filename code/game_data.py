@@ -340,4 +340,12 @@ ATTACK_DATA = {
 	'explosion':  {'target': 'opponent', 'amount': 2,    'cost': 90, 'element': 'fire',   'animation': 'explosion'},
 	'annihilate': {'target': 'opponent', 'amount': 3,    'cost': 30, 'element': 'fire',   'animation': 'explosion'},
 	'ice':        {'target': 'opponent', 'amount': 2,    'cost': 15, 'element': 'water',  'animation': 'ice'},
+}
+
+# damage multiplier of an attack element against a monster element, anything not listed is 1
+ELEMENT_DATA = {
+	'normal': {},
+	'fire':   {'plant': 2, 'water': 0.5},
+	'water':  {'fire': 2,  'plant': 0.5},
+	'plant':  {'water': 2, 'fire': 0.5},
 }
\ No newline at end of file
@@ -1,41 +1,151 @@
 from settings import * 
-from support import import_image
+from timer import AnimationClock # type: ignore
 from entities import Entity
-import os
+from spatial import SpatialHash
+from bisect import bisect_left, insort
 
 class AllSprites(pygame.sprite.Group):
-	def __init__(self):
+	def __init__(self, shadow_surf, notice_surf):
 		super().__init__()
 		self.display_surface = pygame.display.get_surface()
 		self.offset = vector()
-		# base path of the current file
-		base_path = os.path.dirname(os.path.abspath(__file__))
+		self.animation_clock = AnimationClock(ANIMATION_SPEED)
+
+		# spatial hash for culling sprites outside of the camera
+		self.grid = SpatialHash(GRID_CELL_SIZE)
+		self.pending = {}
+		self.entities = set()
+		self.blit_count = 0
+
+		# persistent layers, the main layer is kept sorted by y_sort
+		self.bg_sprites, self.fg_sprites = {}, {}
+		self.main_sprites = []
+		self.y_sorts = {}
+
+		# loaded once by the game and shared by every scene
+		self.shadow_surf = shadow_surf
+		self.notice_surf = notice_surf
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		# rect and z are only set after a sprite joins its groups
+		self.pending[sprite] = None
 
-		# full path to the shadow image
-		shadow_image_path = os.path.join(base_path, '..', 'graphics', 'other', 'shadow')
-		self.shadow_surf = import_image(shadow_image_path)
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		if sprite in self.pending:
+			del self.pending[sprite]
+			return
+		self.grid.remove(sprite)
+		self.entities.discard(sprite)
+		self.bg_sprites.pop(sprite, None)
+		self.fg_sprites.pop(sprite, None)
+		if sprite in self.y_sorts:
+			self.remove_sorted(sprite)
+
+	# main layer order
+	def insert_sorted(self, sprite):
+		self.y_sorts[sprite] = sprite.y_sort
+		insort(self.main_sprites, sprite, key = self.y_sorts.get)
+
+	def remove_sorted(self, sprite):
+		index = bisect_left(self.main_sprites, self.y_sorts[sprite], key = self.y_sorts.get)
+		while self.main_sprites[index] is not sprite:
+			index += 1
+		del self.main_sprites[index]
+		del self.y_sorts[sprite]
+
+	def update_layers(self):
+		for sprite in self.pending:
+			self.grid.insert(sprite, sprite.rect)
+			if isinstance(sprite, Entity):
+				self.entities.add(sprite)
+
+			if sprite.z < WORLD_LAYERS['main']:
+				self.bg_sprites[sprite] = None
+			elif sprite.z == WORLD_LAYERS['main']:
+				self.insert_sorted(sprite)
+			else:
+				self.fg_sprites[sprite] = None
+		self.pending.clear()
 
-		# full path to the notice image
-		notice_image_path = os.path.join(base_path, '..', 'graphics', 'ui', 'notice')
-		self.notice_surf = import_image(notice_image_path)
+		# only sprites that moved are re-bucketed and re-sorted
+		for entity in self.entities:
+			self.grid.move(entity, entity.rect)
+			if entity.y_sort != self.y_sorts[entity]:
+				self.remove_sorted(entity)
+				self.insert_sorted(entity)
 
-	def draw(self, player):
-		self.offset.x = -(player.rect.centerx - WINDOW_WIDTH / 2)
-		self.offset.y = -(player.rect.centery - WINDOW_HEIGHT / 2)
+	def update(self, dt):
+		for entity in self.entities:
+			entity.previous_pos.update(entity.rect.topleft)
+		self.animation_clock.update(dt)
+		super().update(dt)
 
-		bg_sprites = [sprite for sprite in self if sprite.z < WORLD_LAYERS['main']]
-		main_sprites = sorted([sprite for sprite in self if sprite.z == WORLD_LAYERS['main']], key = lambda sprite: sprite.y_sort)
-		fg_sprites = [sprite for sprite in self if sprite.z > WORLD_LAYERS['main']]
+	def draw(self, player, alpha = 1):
+		player_pos = player.get_render_pos(alpha)
+		self.offset.x = -(player_pos.x + player.rect.width / 2 - WINDOW_WIDTH / 2)
+		self.offset.y = -(player_pos.y + player.rect.height / 2 - WINDOW_HEIGHT / 2)
 
-		for layer in (bg_sprites, main_sprites, fg_sprites):
+		self.update_layers()
+		view_rect = pygame.FRect(-self.offset, (WINDOW_WIDTH, WINDOW_HEIGHT))
+		visible_sprites = self.grid.query(view_rect)
+
+		# the layers are kept in draw order as sprites join and move, nothing is sorted here
+		self.blit_count = 0
+		for layer in (self.bg_sprites, self.main_sprites, self.fg_sprites):
 			for sprite in layer:
+				if sprite not in visible_sprites:
+					continue
 				if isinstance(sprite, Entity):
-					self.display_surface.blit(self.shadow_surf, sprite.rect.topleft + self.offset + vector(40,110))
-				self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
+					pos = sprite.get_render_pos(alpha)
+					self.display_surface.blit(self.shadow_surf, pos + self.offset + vector(40,110))
+				else:
+					pos = sprite.rect.topleft
+				self.display_surface.blit(sprite.image, pos + self.offset)
+				self.blit_count += 1
 				if sprite == player and player.noticed:
-					rect = self.notice_surf.get_frect(midbottom = sprite.rect.midtop)
+					rect = self.notice_surf.get_frect(midbottom = pos + vector(sprite.rect.width / 2, 0))
 					self.display_surface.blit(self.notice_surf, rect.topleft + self.offset)
 
+class CollisionSprites(pygame.sprite.Group):
+	def __init__(self):
+		super().__init__()
+		# static hitboxes live in a grid, moving characters in their own bucket
+		self.grid = SpatialHash(COLLISION_CELL_SIZE)
+		self.dynamic_sprites = set()
+		self.pending = {}
+		# changes whenever the collision layout changes
+		self.version = 0
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		# hitboxes are only set after a sprite joins its groups
+		self.pending[sprite] = None
+		self.version += 1
+
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		self.version += 1
+		if sprite in self.pending:
+			del self.pending[sprite]
+			return
+		self.grid.remove(sprite)
+		self.dynamic_sprites.discard(sprite)
+
+	def update_grid(self):
+		for sprite in self.pending:
+			if isinstance(sprite, Entity):
+				self.dynamic_sprites.add(sprite)
+			else:
+				self.grid.insert(sprite, sprite.hitbox)
+		self.pending.clear()
+
+	def near(self, rect):
+		# sprites whose hitbox might overlap rect
+		self.update_grid()
+		return list(self.grid.query(rect)) + [sprite for sprite in self.dynamic_sprites if sprite.hitbox.colliderect(rect)]
+
 class BattleSprites(pygame.sprite.Group):
 	def __init__(self):
 		super().__init__()
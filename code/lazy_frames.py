@@ -0,0 +1,35 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+
+class LazyFrames(Mapping):
+	def __init__(self, names, loader, max_size):
+		self.names = set(names)
+		self.loader = loader
+		self.max_size = max_size
+		# least recently used first
+		self.loaded = OrderedDict()
+
+	def __getitem__(self, name):
+		if name in self.loaded:
+			self.loaded.move_to_end(name)
+		elif name in self.names:
+			self.loaded[name] = self.loader(name)
+			while len(self.loaded) > self.max_size:
+				self.loaded.popitem(last = False)
+		else:
+			raise KeyError(name)
+		return self.loaded[name]
+
+	def __contains__(self, name):
+		return name in self.names
+
+	def __iter__(self):
+		return iter(self.names)
+
+	def __len__(self):
+		return len(self.names)
+
+	def prefetch(self, names):
+		# names in order of priority, never more than fit so nothing fetched here is dropped again
+		for name in [name for name in names if name in self.names][:self.max_size]:
+			self[name]
@@ -4,15 +4,22 @@ from pytmx.util_pygame import load_pygame
 from os.path import join, dirname, abspath
 from random import randint
 
-from sprites import Sprite, AnimatedSprite, MonsterPatchSprite, BorderSprite, CollidableSprite, TransitionSprite
+from sprites import Sprite, TerrainChunk, AnimatedSprite, MonsterPatchSprite, BorderSprite, CollidableSprite, TransitionSprite
 from entities import Player, Character
-from groups import AllSprites
+from scene import Scene
+from collections import OrderedDict
 from dialog import DialogTree
 from monster_index import MonsterIndex
 from battle import Battle
 from timer import Timer # type: ignore
 from evolution import Evolution
-
+from debug import Profiler
+from asset_cache import AssetCache
+from lazy_frames import LazyFrames
+from atlas import TextureAtlas
+from audio import MusicPlayer, SoundBank
+from map_loader import LazyMaps
+from asset_pipeline import asset_paths, preload_assets
 from support import *
 from monster import Monster
 
@@ -22,6 +29,9 @@ class Game:
         self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption('Monster Hunter')
         self.clock = pygame.time.Clock()
+        self.step = 1 / TICK_RATE
+        self.accumulator = 0
+        self.profiler = Profiler()
         self.encounter_timer = Timer(2000, func=self.monster_encounter)
 
         # player monsters
@@ -43,12 +53,9 @@ class Game:
             2: Monster('Larvea', 12),
         }
 
-        # groups
-        self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
-        self.character_sprites = pygame.sprite.Group()
-        self.transition_sprites = pygame.sprite.Group()
-        self.monster_sprites = pygame.sprite.Group()
+        # groups, recently visited maps keep theirs, setup loads the first one
+        self.scenes = OrderedDict()
+        self.scene = None
 
         # transition/tint
         self.transition_target = None
@@ -73,26 +80,57 @@ class Game:
 
     def import_assets(self):
         base_path = dirname(abspath(__file__))
+        # sliced and outlined frames from previous launches
+        self.asset_cache = cache = AssetCache(join(base_path, '..', 'cache', 'assets.bin')) if ASSET_CACHE else None
+
+        # decode images and sounds on all cores, the importers below pick them up
+        self.import_time = None
+        if PARALLEL_IMPORT:
+            graphics_path = join(base_path, '..', 'graphics')
+            folders = [('tilesets', 'water'), ('tilesets', 'coast.png'), ('characters',), ('icons',), ('ui',), ('attacks',), ('backgrounds',), ('other', 'star animation')]
+            if not LAZY_MONSTER_FRAMES:
+                folders.append(('monsters',))
+            paths = [join(graphics_path, *folder) for folder in folders]
+            if not STREAM_MUSIC:
+                paths.append(join(base_path, '..', 'audio'))
+            self.import_time = preload_assets(asset_paths(*paths, skip = cache.fresh_sources() if cache else ()), IMPORT_WORKERS)
 
         # maps
-        self.tmx_maps = tmx_importer(base_path, '..', 'data', 'maps')
+        if LAZY_MAPS:
+            # parsed on first use, transition targets in the background
+            self.tmx_maps = LazyMaps(file_paths(base_path, '..', 'data', 'maps'))
+        else:
+            self.tmx_maps = tmx_importer(base_path, '..', 'data', 'maps')
 
         # overworld
         self.overworld_frames = {
-            'water': import_folder(base_path, '..', 'graphics', 'tilesets', 'water'),
-            'coast': coast_importer(24, 12, base_path, '..', 'graphics', 'tilesets', 'coast'),
-            'characters': all_character_import(base_path, '..', 'graphics', 'characters')
+            'water': import_folder(base_path, '..', 'graphics', 'tilesets', 'water', cache = cache),
+            'coast': coast_importer(24, 12, base_path, '..', 'graphics', 'tilesets', 'coast', cache = cache),
+            'characters': all_character_import(base_path, '..', 'graphics', 'characters', cache = cache),
+            'shadow': import_image(base_path, '..', 'graphics', 'other', 'shadow'),
+            'notice': import_image(base_path, '..', 'graphics', 'ui', 'notice')
         }
 
         # monsters
         monsters_path = (4, 2, base_path, '..', 'graphics', 'monsters')
         self.monster_frames = {
-            'icons': import_folder_dict(base_path, '..', 'graphics', 'icons'),
-            'monsters': monster_importer(*monsters_path),
-            'ui': import_folder_dict(base_path, '..', 'graphics', 'ui'),
-            'attacks': attack_importer(base_path, '..', 'graphics', 'attacks'),
+            'icons': import_folder_dict(base_path, '..', 'graphics', 'icons', cache = cache),
+            'ui': import_folder_dict(base_path, '..', 'graphics', 'ui', cache = cache),
+            'attacks': attack_importer(base_path, '..', 'graphics', 'attacks', cache = cache),
         }
-        self.monster_frames['outlines'] = outline_creator(self.monster_frames['monsters'], 4)
+        self.atlas = atlas = TextureAtlas(ATLAS_SIZE) if TEXTURE_ATLAS else None
+        pack = atlas.pack if atlas else lambda frames: frames
+        if LAZY_MONSTER_FRAMES:
+            # species are loaded on first use and the least recently used are dropped, each species gets its own pages
+            monster_names = folder_names(*monsters_path[2:])
+            monsters = LazyFrames(monster_names, lambda name: pack(import_monster(*monsters_path, name, cache = cache)), MONSTER_CACHE_SIZE)
+            outlines = LazyFrames(monster_names, lambda name: pack(import_outlines(monsters[name], 4, *monsters_path[2:], name, cache = cache)), MONSTER_CACHE_SIZE)
+            self.monster_frames = pack(self.monster_frames)
+            self.monster_frames['monsters'], self.monster_frames['outlines'] = monsters, outlines
+        else:
+            self.monster_frames['monsters'] = monster_importer(*monsters_path, cache = cache)
+            self.monster_frames['outlines'] = outline_creator(self.monster_frames['monsters'], 4, *monsters_path[2:], cache = cache)
+            self.monster_frames = pack(self.monster_frames)
 
         # fonts
         self.fonts = {
@@ -103,34 +141,83 @@ class Game:
         }
 
         # battle
-        self.bg_frames = import_folder_dict(base_path, '..', 'graphics', 'backgrounds')
-        self.start_animation_frames = import_folder(base_path, '..', 'graphics', 'other', 'star animation')
+        self.bg_frames = import_folder_dict(base_path, '..', 'graphics', 'backgrounds', cache = cache)
+        self.start_animation_frames = import_folder(base_path, '..', 'graphics', 'other', 'star animation', cache = cache)
+        if cache:
+            cache.save()
 
         # audio
-        self.audio = audio_importer(base_path, '..', 'audio')
+        if STREAM_MUSIC:
+            # music is streamed, sound effects load on first use
+            self.music = MusicPlayer(MUSIC_FADE)
+            self.audio = SoundBank(file_paths(base_path, '..', 'audio'), self.music)
+        else:
+            self.music = None
+            self.audio = audio_importer(base_path, '..', 'audio')
+        # the importers above took what they needed from the parallel decode
+        decoded_assets.clear()
 
         
+    def load_scene(self, scene):
+        self.scene = scene
+        self.all_sprites = scene.all_sprites
+        self.collision_sprites = scene.collision_sprites
+        self.character_sprites = scene.character_sprites
+        self.transition_sprites = scene.transition_sprites
+        self.monster_sprites = scene.monster_sprites
+        self.triggers = scene.triggers
+        self.chunk_memory = scene.chunk_memory
+        if scene.player:
+            self.player = scene.player
+
     def setup(self, tmx_map, player_start_pos):
-        # clear map 
-        for group in (self.all_sprites, self.collision_sprites, self.transition_sprites, self.character_sprites):
-            group.empty()
-
-        # go through the 'Terrain' and 'Terrain Top' layer of map
-        for layer in ['Terrain', 'Terrain Top']:
-            for x, y, surf in tmx_map.get_layer_by_name(layer).tiles():
-                Sprite((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, WORLD_LAYERS['bg'])
+        if tmx_map in self.scenes:
+            # recently visited map: swap its groups back in and move the player
+            self.scenes.move_to_end(tmx_map)
+            self.load_scene(self.scenes[tmx_map])
+            self.scene.place_player(player_start_pos)
+        else:
+            self.build_scene(tmx_map, player_start_pos)
+
+        # load the team and the species in this map's grass, trainer monsters load when their battle starts
+        if LAZY_MONSTER_FRAMES and PREFETCH_MONSTERS:
+            names = [monster.name for monster in self.player_monsters.values()]
+            names += [name for sprite in self.monster_sprites for name in sprite.monsters]
+            names = list(dict.fromkeys(names))
+            for frames in (self.monster_frames['monsters'], self.monster_frames['outlines']):
+                frames.prefetch(names)
+
+    def build_scene(self, tmx_map, player_start_pos):
+        # new groups for this map
+        self.load_scene(Scene(self.overworld_frames['shadow'], self.overworld_frames['notice']))
+
+        # bake the 'Terrain' and 'Terrain Top' layers of map into chunks
+        chunks = [TerrainChunk(pos, surf, self.all_sprites) for pos, surf in terrain_chunks(tmx_map, ['Terrain', 'Terrain Top'], CHUNK_SIZE).items()]
+        # memory used by each chunk in bytes, keyed by chunk position
+        self.chunk_memory.update({chunk.rect.topleft: chunk.memory for chunk in chunks})
         
-        # go through the 'Water' layer and place the player
+        # go through the 'Water' and 'Coast' layers, all sharing one animation clock
+        clock = self.all_sprites.animation_clock
+        animated_tiles = {}
         for obj in tmx_map.get_layer_by_name('Water'):
             for x in range(int(obj.x), int(obj.x + obj.width), TILE_SIZE):
                 for y in range(int(obj.y), int(obj.y + obj.height), TILE_SIZE):
-                    AnimatedSprite((x,y), self.overworld_frames['water'], self.all_sprites,  WORLD_LAYERS['water'])
+                    if BAKE_ANIMATED_TILES:
+                        animated_tiles.setdefault((x, y), []).append(self.overworld_frames['water'])
+                    else:
+                        AnimatedSprite((x,y), self.overworld_frames['water'], self.all_sprites,  WORLD_LAYERS['water'], clock)
         
-        # go through the 'Coast' layer and place the player
         for obj in tmx_map.get_layer_by_name('Coast'):
             terrain = obj.properties['terrain']
             side = obj.properties['side']
-            AnimatedSprite((obj.x, obj.y), self.overworld_frames['coast'][terrain][side], self.all_sprites, WORLD_LAYERS['bg'])
+            if BAKE_ANIMATED_TILES:
+                animated_tiles.setdefault((int(obj.x), int(obj.y)), []).append(self.overworld_frames['coast'][terrain][side])
+            else:
+                AnimatedSprite((obj.x, obj.y), self.overworld_frames['coast'][terrain][side], self.all_sprites, WORLD_LAYERS['bg'], clock)
+
+        # one animated sprite per contiguous water/coast region
+        for pos, frames in bake_animated_tiles(animated_tiles, CHUNK_SIZE):
+            AnimatedSprite(pos, frames, self.all_sprites, WORLD_LAYERS['water'], clock)
         
         # go through the 'Objects' layer of map
         for obj in tmx_map.get_layer_by_name('Objects'):
@@ -142,6 +229,8 @@ class Game:
         # transition objects
         for obj in tmx_map.get_layer_by_name('Transition'):
             TransitionSprite((obj.x, obj.y), (obj.width, obj.height), (obj.properties['target'], obj.properties['pos']), self.transition_sprites)
+        if LAZY_MAPS:
+            self.tmx_maps.prefetch({sprite.target[0] for sprite in self.transition_sprites})
 
         # collidable objects
         for obj in tmx_map.get_layer_by_name('Collisions'):
@@ -154,6 +243,7 @@ class Game:
         # go through the 'Entities' layer and place the player
         for obj in tmx_map.get_layer_by_name('Entities'):
             if obj.name == 'Player':
+                self.scene.player_starts[obj.properties['pos']] = ((obj.x, obj.y), obj.properties['direction'])
                 if obj.properties['pos'] == player_start_pos:
                     self.player = Player(
                         pos = (obj.x, obj.y),
@@ -175,19 +265,37 @@ class Game:
                     nurse = obj.properties['character_id'] == 'Nurse',
                     notice_sound = self.audio['notice'])
 
+        # trigger zones for transitions, grass patches and characters
+        for sprite in self.transition_sprites:
+            self.triggers.add_zone(sprite, 'transition')
+        for sprite in self.monster_sprites:
+            self.triggers.add_zone(sprite, 'monster')
+        for character in self.character_sprites:
+            self.triggers.add_character(character)
+
+        # characters listed before the player in the 'Entities' layer were given the previous player
+        self.scene.player = self.player
+        for character in self.character_sprites:
+            character.player = self.player
+
+        if SCENE_CACHE_SIZE:
+            self.scenes[tmx_map] = self.scene
+            while len(self.scenes) > SCENE_CACHE_SIZE:
+                self.scenes.popitem(last = False)
+
     def input(self):
         if not self.dialog_tree and not self.battle:
             keys = pygame.key.get_just_pressed()
             if keys[pygame.K_SPACE]:
-                for character in self.character_sprites:
-                    if check_connections(100, self.player, character):
-                        # block player input 
-                        self.player.block()
-                        # entities face each other
-                        character.change_facing_direction(self.player.rect.center)
-                        # dialog
-                        self.create_dialog(character)
-                        character.can_rotate = False
+                character = self.triggers.interaction(self.player, 100)
+                if character:
+                    # block player input 
+                    self.player.block()
+                    # entities face each other
+                    character.change_facing_direction(self.player.rect.center)
+                    # dialog
+                    self.create_dialog(character)
+                    character.can_rotate = False
             if keys[pygame.K_RETURN]:
                 self.index_open = not self.index_open
                 self.player.blocked = not self.player.blocked
@@ -214,7 +322,7 @@ class Game:
 
     # transitions
     def transition_check(self):
-        sprites = [sprite for sprite in self.transition_sprites if sprite.rect.colliderect(self.player.hitbox)]
+        sprites = self.triggers.overlapping('transition', self.player.hitbox)
         if sprites:
             self.player.block()
             self.transition_target = sprites[0].target
@@ -272,12 +380,12 @@ class Game:
         self.audio['overworld'].play(-1)
     # monsters in grass 
     def check_monster(self):
-        if [sprite for sprite in self.monster_sprites if sprite.rect.colliderect(self.player.hitbox)] and not self.battle and self.player.direction:
+        if not self.battle and self.player.direction and self.triggers.overlapping('monster', self.player.hitbox):
             if not self.encounter_timer.active:
                 self.encounter_timer.activate() 
     
     def monster_encounter(self):
-        sprites = [sprite for sprite in self.monster_sprites if sprite.rect.colliderect(self.player.hitbox)]
+        sprites = self.triggers.overlapping('monster', self.player.hitbox)
         if sprites and self.player.direction:
             self.encounter_timer.duration = randint(800, 2500)
             self.player.block()
@@ -286,47 +394,103 @@ class Game:
             self.transition_target = Battle(self.player_monsters, {index:Monster(monster, sprites[0].level + randint(-3, 3)) for index, monster in enumerate(sprites[0].monsters)}, self.monster_frames, self.bg_frames[sprites[0].biome], self.fonts, self.end_battle, None, self.audio)
             self.tint_mode = 'tint'
 
+    def read_input(self):
+        # key presses are only read once per frame
+        self.input()
+        if self.dialog_tree:
+            self.dialog_tree.update()
+        if self.battle:
+            self.battle.input()
+
+    def simulate(self, dt):
+        # starts the next music track once the previous one faded out
+        if self.music:
+            self.music.update()
+
+        # looks at all sprites and update
+        self.encounter_timer.update()
+        self.profiler.mark('encounter timer')
+        self.transition_check()
+        self.profiler.mark('transition check')
+        self.all_sprites.update(dt)
+        self.profiler.mark('sprites update')
+        self.check_monster()
+        self.profiler.mark('check monster')
+        if self.battle:
+            self.battle.update(dt)
+            self.profiler.mark('battle update')
+
+    def render(self, dt, alpha = 1):
+        # draw
+        self.all_sprites.draw(self.player, alpha)
+        self.profiler.mark('sprites draw')
+
+        # overlays 
+        if self.index_open:
+            self.monster_index.update(dt)
+            self.profiler.mark('monster index')
+        if self.battle:
+            self.battle.draw()
+            self.profiler.mark('battle draw')
+        if self.evolution:
+            self.evolution.update(dt)
+            self.profiler.mark('evolution')
+
+        # screen tint (fade to black for transition)
+        self.tint_screen(dt)
+        self.profiler.mark('tint screen')
+
     def run(self):
         # main game loop to keep the game running
         while True:
             # track the frame rate 
             # time difference between current frame and last frame
-            dt = self.clock.tick() / 1000 # 1000 ms in second
+            dt = self.clock.tick(MAX_FPS) / 1000 # 1000 ms in second
+            self.profiler.begin()
             self.display_surface.fill('black')
 
             # game loop
             for event in pygame.event.get():
                 # if the user clicks the close button
                 if event.type == pygame.QUIT:
+                    # keep frames that were first loaded this session
+                    if self.asset_cache:
+                        self.asset_cache.save()
                     # exit 
                     pygame.quit()
                     exit()
-            
-            # looks at all sprites and update
-            self.encounter_timer.update()
-            self.input()
-            self.transition_check()
-            self.all_sprites.update(dt)
-            self.check_monster()
-    
-            # draw
-            self.all_sprites.draw(self.player)
-
-            # overlays 
-            if self.dialog_tree:
-                self.dialog_tree.update()
-            if self.index_open:
-                self.monster_index.update(dt)
-            if self.battle:
-                self.battle.update(dt)
-            if self.evolution:
-                self.evolution.update(dt)
-
-            # screen tint (fade to black for transition)
-            self.tint_screen(dt)
+                # profiler overlay
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.profiler.toggle()
+            self.profiler.mark('events')
+
+            self.read_input()
+            self.profiler.mark('input')
+            if FIXED_TIMESTEP:
+                # catch up in fixed steps, dropping time beyond MAX_CATCHUP_STEPS
+                self.accumulator = min(self.accumulator + dt, self.step * MAX_CATCHUP_STEPS)
+                steps = 0
+                while self.accumulator >= self.step:
+                    self.simulate(self.step)
+                    self.accumulator -= self.step
+                    steps += 1
+                alpha = self.accumulator / self.step
+            else:
+                self.simulate(dt)
+                steps, alpha = 1, 1
+
+            self.render(dt, alpha)
+
+            if self.profiler.active:
+                battle_sprites = len(self.battle.battle_sprites) if self.battle else 0
+                self.profiler.count('sprites updated', steps * (len(self.all_sprites) + battle_sprites))
+                self.profiler.count('sprites blitted', self.all_sprites.blit_count + battle_sprites)
+                self.profiler.draw()
 
             # update the display with any changes
             pygame.display.update()
+            self.profiler.mark('display update')
+            self.profiler.end()
 
 
 if __name__ == '__main__':
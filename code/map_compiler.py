@@ -0,0 +1,96 @@
+# compiles every map in data/maps into the binary format read by map_loader
+# usage: python map_compiler.py
+from os.path import abspath, dirname, join, relpath
+from xml.etree import ElementTree
+from pytmx import TiledMap, TiledTileLayer, TiledObjectGroup
+from map_loader import MAGIC, VERSION, HEADER, TILE, OBJECT, PROPERTY, PROPERTY_TYPES, GID_TYPE, compiled_path
+from asset_cache import file_hash
+from array import array
+import json
+import os
+
+def record_loader(images, folder):
+	# stands in for the pygame image loader and keeps where each tile comes from
+	def loader(filename, colorkey, **kwargs):
+		image = (relpath(filename, folder), colorkey)
+		if image not in images:
+			images.append(image)
+		image_index = images.index(image)
+
+		def load(rect = None, flags = None):
+			flip = (flags.flipped_horizontally | flags.flipped_vertically << 1 | flags.flipped_diagonally << 2) if flags else 0
+			return (image_index, *(rect or (0, 0, 0, 0)), flip)
+		return load
+	return loader
+
+def packed_properties(obj):
+	# tile objects also carry the tile's animation frames, which setup never reads
+	return {key: value for key, value in obj.properties.items() if type(value) in PROPERTY_TYPES}
+
+def compile_map(tmx_path):
+	folder = dirname(tmx_path)
+	images = []
+	tmx_map = TiledMap(tmx_path, image_loader = record_loader(images, folder))
+
+	# interned strings for object names and property keys and values
+	strings, string_ids = [], {}
+	def intern(text):
+		if text not in string_ids:
+			string_ids[text] = len(strings)
+			strings.append(text)
+		return string_ids[text]
+
+	data = bytearray()
+	for tile in tmx_map.images[1:]:
+		data += TILE.pack(*tile) if tile else TILE.pack(-1, 0, 0, 0, 0, 0)
+
+	layers, properties = [], bytearray()
+	for layer in tmx_map.layers:
+		if isinstance(layer, TiledTileLayer):
+			gids = array(GID_TYPE, [gid for row in layer.data for gid in row])
+			layers.append({'name': layer.name, 'kind': 'tiles', 'offset': len(data)})
+			data += gids.tobytes()
+		elif isinstance(layer, TiledObjectGroup):
+			layers.append({'name': layer.name, 'kind': 'objects', 'offset': len(data), 'count': len(layer)})
+			for obj in layer:
+				first = len(properties) // PROPERTY.size
+				packed = packed_properties(obj)
+				for key, value in packed.items():
+					properties += PROPERTY.pack(intern(key), intern(str(value)), PROPERTY_TYPES.index(type(value)))
+				name = intern(obj.name) if obj.name is not None else -1
+				data += OBJECT.pack(obj.x, obj.y, obj.width, obj.height, name, obj.gid, first, len(packed))
+
+	# the map is stale once the tmx or any tileset it references changes
+	sources = [relpath(tmx_path, folder)]
+	sources += [node.get('source') for node in ElementTree.parse(tmx_path).getroot().iter('tileset') if node.get('source')]
+	stats = {source: os.stat(join(folder, source)) for source in sources}
+
+	index = json.dumps({
+		'sources': {source: [stat.st_mtime_ns, stat.st_size, file_hash(join(folder, source))] for source, stat in stats.items()},
+		'width': tmx_map.width,
+		'height': tmx_map.height,
+		'strings': strings,
+		'images': images,
+		'tiles': len(tmx_map.images) - 1,
+		'layers': layers,
+		'properties': len(data)}).encode()
+
+	path = compiled_path(tmx_path)
+	os.makedirs(dirname(path), exist_ok = True)
+	with open(path + '.tmp', 'wb') as file:
+		file.write(HEADER.pack(MAGIC, VERSION, len(index)))
+		file.write(index)
+		file.write(data)
+		file.write(properties)
+	os.replace(path + '.tmp', path)
+	return path
+
+def main():
+	maps_path = join(dirname(abspath(__file__)), '..', 'data', 'maps')
+	for file_name in sorted(os.listdir(maps_path)):
+		if file_name.endswith('.tmx'):
+			path = compile_map(join(maps_path, file_name))
+			print(f'{file_name} -> {relpath(path)} ({os.path.getsize(path)} bytes)')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,186 @@
+from settings import *
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from os.path import basename, dirname, join, splitext
+from functools import partial
+from pytmx import TiledMap, TileFlags
+from pytmx.util_pygame import pygame_image_loader, handle_transformation, smart_convert
+from asset_cache import file_hash
+import json
+import mmap
+import os
+import struct
+
+# compiled map files live next to the maps folder
+COMPILED_FOLDER = join('..', 'compiled')
+
+# magic, format version, index size, followed by the json index and the packed tables
+MAGIC, VERSION = b'VDMP', 1
+HEADER = struct.Struct('<4sIQ')
+# tileset image index, source rect (zero size for whole images), flip flags
+TILE = struct.Struct('<iHHHHB')
+# x, y, width, height, name, gid, first property, property count
+OBJECT = struct.Struct('<ddddiIII')
+# key, value, value type
+PROPERTY = struct.Struct('<IIB')
+PROPERTY_TYPES = (str, int, float, bool, type(None))
+GID_TYPE = 'H'
+
+def compiled_path(tmx_path):
+	return join(dirname(tmx_path), COMPILED_FOLDER, splitext(basename(tmx_path))[0] + '.map')
+
+def read_value(text, kind):
+	value_type = PROPERTY_TYPES[kind]
+	if value_type is bool:
+		return text == 'True'
+	return None if value_type is type(None) else value_type(text)
+
+class TileLayer:
+	def __init__(self, name, gids, width, images):
+		self.name = name
+		self.gids = gids
+		self.width = width
+		self.images = images
+
+	def tiles(self):
+		images, width = self.images, self.width
+		for index, gid in enumerate(self.gids):
+			if gid and images[gid]:
+				yield index % width, index // width, images[gid]
+
+class MapObject:
+	__slots__ = ('x', 'y', 'width', 'height', 'name', 'image', 'properties')
+
+	def __init__(self, x, y, width, height, name, image, properties):
+		self.x, self.y = x, y
+		self.width, self.height = width, height
+		self.name = name
+		self.image = image
+		self.properties = properties
+
+class CompiledMap:
+	# the part of the pytmx TiledMap interface that Game.setup uses
+	def __init__(self, index, buffer, start, folder):
+		self.width, self.height = index['width'], index['height']
+		strings = index['strings']
+
+		# tileset images are loaded once and sliced like pytmx does
+		sources = [(pygame.image.load(join(folder, path)), pygame.Color(f'#{colorkey}') if colorkey else None) for path, colorkey in index['images']]
+		self.images = [None]
+		for image_index, x, y, width, height, flags in TILE.iter_unpack(buffer[start:start + index['tiles'] * TILE.size]):
+			if image_index < 0:
+				self.images.append(None)
+				continue
+			image, colorkey = sources[image_index]
+			tile = image.subsurface((x, y, width, height)) if width else image.copy()
+			if flags:
+				tile = handle_transformation(tile, TileFlags(bool(flags & 1), bool(flags & 2), bool(flags & 4)))
+			self.images.append(smart_convert(tile, colorkey, True))
+
+		properties_start = start + index['properties']
+		self.layers = {}
+		for layer in index['layers']:
+			# like pytmx, a repeated name refers to the last layer
+			offset = start + layer['offset']
+			if layer['kind'] == 'tiles':
+				gids = array(GID_TYPE, buffer[offset:offset + self.width * self.height * array(GID_TYPE).itemsize])
+				self.layers[layer['name']] = TileLayer(layer['name'], gids, self.width, self.images)
+			else:
+				objects = []
+				for x, y, width, height, name, gid, first, count in OBJECT.iter_unpack(buffer[offset:offset + layer['count'] * OBJECT.size]):
+					properties = {}
+					for key, value, kind in PROPERTY.iter_unpack(buffer[properties_start + first * PROPERTY.size:properties_start + (first + count) * PROPERTY.size]):
+						properties[strings[key]] = read_value(strings[value], kind)
+					objects.append(MapObject(x, y, width, height, strings[name] if name >= 0 else None, self.images[gid] if gid else None, properties))
+				self.layers[layer['name']] = objects
+
+	def get_layer_by_name(self, name):
+		if name not in self.layers:
+			raise ValueError(f'layer "{name}" not found')
+		return self.layers[name]
+
+def is_fresh(sources, folder):
+	for path, (mtime, size, digest) in sources.items():
+		try:
+			stat = os.stat(join(folder, path))
+		except OSError:
+			return False
+		if (stat.st_mtime_ns, stat.st_size) != (mtime, size) and file_hash(join(folder, path)) != digest:
+			return False
+	return True
+
+class TmxMap(TiledMap):
+	# a pytmx map whose xml is parsed on construction and whose images are loaded by load_images
+	def __init__(self, tmx_path):
+		super().__init__(tmx_path, image_loader = pygame_image_loader)
+
+	def reload_images(self):
+		pass
+
+	def load_images(self):
+		TiledMap.reload_images(self)
+		return self
+
+def read_compiled(tmx_path):
+	# the index and packed tables of the compiled file,
+	# None if there is no compiled file or the tmx/tsx sources changed since it was built
+	try:
+		with open(compiled_path(tmx_path), 'rb') as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+			magic, version, index_size = HEADER.unpack_from(buffer)
+			if magic != MAGIC or version != VERSION:
+				return None
+			index = json.loads(buffer[HEADER.size:HEADER.size + index_size])
+			folder = dirname(tmx_path)
+			if not is_fresh(index['sources'], folder):
+				return None
+			return index, buffer[HEADER.size + index_size:], folder
+	except (OSError, ValueError, struct.error):
+		return None
+
+def read_map(tmx_path):
+	# reads and parses the map files without touching pygame, so it can run on any thread,
+	# returns the function that loads the images and builds the map on the main thread
+	compiled = read_compiled(tmx_path) if COMPILED_MAPS else None
+	if compiled:
+		index, data, folder = compiled
+		return partial(CompiledMap, index, data, 0, folder)
+	return TmxMap(tmx_path).load_images
+
+def load_map(tmx_path):
+	return read_map(tmx_path)()
+
+class LazyMaps(Mapping):
+	def __init__(self, paths, reader = read_map):
+		self.paths = paths
+		self.reader = reader
+		self.loaded = {}
+
+		# maps being read and parsed in the background, their images are loaded on first access
+		self.pending = {}
+		self.executor = ThreadPoolExecutor(1, thread_name_prefix = 'map prefetch')
+
+	def __getitem__(self, name):
+		if name not in self.loaded:
+			if name in self.pending:
+				# waits only if the prefetch has not finished yet
+				self.loaded[name] = self.pending.pop(name).result()()
+			elif name in self.paths:
+				self.loaded[name] = self.reader(self.paths[name])()
+			else:
+				raise KeyError(name)
+		return self.loaded[name]
+
+	def __contains__(self, name):
+		return name in self.paths
+
+	def __iter__(self):
+		return iter(self.paths)
+
+	def __len__(self):
+		return len(self.paths)
+
+	def prefetch(self, names):
+		for name in sorted(names):
+			if name in self.paths and name not in self.loaded and name not in self.pending:
+				self.pending[name] = self.executor.submit(self.reader, self.paths[name])
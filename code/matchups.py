@@ -0,0 +1,182 @@
+import json
+from argparse import ArgumentParser
+from time import perf_counter
+
+import numpy as np
+
+from game_data import MONSTER_DATA
+from battle_core import ATTACK_TIME, FAINT_TIME, OPPONENT_DELAY
+import damage_model
+
+# one on one battles between every pair of species, many at once as array operations.
+# the row species plays the player side like battle_core.auto_action and the column
+# species the opponent side like BattleState.opponent_action, as battle_core.simulate does.
+# battles still going after MAX_TIME seconds count as draws, the same limit simulate uses
+MAX_TIME = 600
+BATCH_SIZE = 1_000_000
+
+def build_tables(names):
+	# numpy views of the damage model tables, species limited to names
+	species_ids = np.array([damage_model.SPECIES_IDS[name] for name in names])
+	stat_rows = np.frombuffer(damage_model.stat_rows).reshape(len(damage_model.SPECIES), damage_model.max_level + 1, damage_model.STAT_COUNT)
+
+	# abilities padded to the longest list, locked slots unlock after the last level
+	width = max(len(MONSTER_DATA[name]['abilities']) for name in names)
+	ability_ids = np.zeros((len(names), width), dtype = int)
+	unlock_levels = np.full((len(names), width), np.inf)
+	for row, name in enumerate(names):
+		for column, (level, ability) in enumerate(MONSTER_DATA[name]['abilities'].items()):
+			ability_ids[row, column] = damage_model.ATTACK_IDS[ability]
+			unlock_levels[row, column] = level
+
+	return {
+		'element': np.array(damage_model.SPECIES_ELEMENTS)[species_ids],
+		'stats': stat_rows[species_ids],
+		'ability_ids': ability_ids,
+		'unlock_levels': unlock_levels,
+		'amount': np.array(damage_model.ATTACK_AMOUNTS),
+		'cost': np.array(damage_model.ATTACK_COSTS),
+		'attack_element': np.array(damage_model.ATTACK_ELEMENTS),
+		'on_self': np.array(damage_model.ATTACK_ON_SELF, dtype = bool),
+		'effectiveness': np.array(damage_model.EFFECTIVENESS).reshape(len(damage_model.ELEMENTS), -1),
+	}
+
+class Side:
+	# one monster per battle, every attribute is an array over the battles
+	def __init__(self, tables, species, level):
+		stats = tables['stats'][species, level].T
+		columns = damage_model.STAT_COLUMNS
+		self.species, self.level = species, level
+		self.element = tables['element'][species]
+		self.max_health = stats[columns['max_health']]
+		self.attack = stats[columns['attack']]
+		self.guard = stats[columns['guard']]
+		self.speed = stats[columns['speed']]
+		self.health = self.max_health.copy()
+		self.energy = stats[columns['max_energy']].copy()
+		self.initiative = np.zeros(len(species))
+		self.defending = np.zeros(len(species), dtype = bool)
+		self.unlocked = tables['unlock_levels'][species] <= level[:, None]
+
+	def take(self, rows):
+		for name, value in vars(self).items():
+			setattr(self, name, value[rows])
+
+def usable_abilities(tables, side, rows):
+	ability_ids = tables['ability_ids'][side.species[rows]]
+	return ability_ids, side.unlocked[rows] & (tables['cost'][ability_ids] < side.energy[rows, None])
+
+def player_abilities(tables, side, rows, rng):
+	# the first affordable ability per battle, -1 when the monster has to defend
+	ability_ids, usable = usable_abilities(tables, side, rows)
+	choice = ability_ids[np.arange(len(rows)), usable.argmax(1)]
+	return np.where(usable.any(1), choice, -1)
+
+def opponent_abilities(tables, side, rows, rng):
+	# a random unlocked ability per battle whatever the energy, opponents never defend
+	ability_ids = tables['ability_ids'][side.species[rows]]
+	weights = rng.random(ability_ids.shape) * side.unlocked[rows]
+	return ability_ids[np.arange(len(rows)), weights.argmax(1)]
+
+def take_turn(tables, actor, other, rows, rng, delay, choose):
+	# the monsters in rows act, returns the seconds their turn took
+	actor.defending[rows] = False
+	abilities = choose(tables, actor, rows, rng)
+	attacking = abilities >= 0
+	actor.defending[rows[~attacking]] = True
+
+	rows, abilities = rows[attacking], abilities[attacking]
+	actor.energy[rows] = np.maximum(0, actor.energy[rows] - tables['cost'][abilities])
+	on_self = tables['on_self'][abilities]
+	for target, hits in ((actor, on_self), (other, ~on_self)):
+		targets, used = rows[hits], abilities[hits]
+		defense = np.clip(target.guard[targets] - 0.2 * target.defending[targets], 0, 1)
+		multiplier = tables['effectiveness'][tables['attack_element'][used], target.element[targets]]
+		target.health[targets] -= actor.attack[targets] * tables['amount'][used] * multiplier * defense
+		target.health[targets] = np.clip(target.health[targets], 0, target.max_health[targets])
+	return delay + ATTACK_TIME * attacking
+
+def run_battles(tables, player_species, opponent_species, levels, rng):
+	# returns the winner per battle (1 player, -1 opponent, 0 draw) and the battle lengths in seconds
+	count = len(levels)
+	player, opponent = Side(tables, player_species, levels), Side(tables, opponent_species, levels)
+	winners, lengths = np.zeros(count, dtype = int), np.zeros(count)
+	active = np.arange(count)
+
+	while len(active):
+		# skip ahead to the next monster reaching full initiative, the player side wins ties
+		player_wait = (100 - player.initiative) / player.speed
+		opponent_wait = (100 - opponent.initiative) / opponent.speed
+		player_turn = player_wait <= opponent_wait
+		wait = np.minimum(player_wait, opponent_wait)
+		player.initiative += player.speed * wait
+		opponent.initiative += opponent.speed * wait
+		player.initiative[player_turn] = 0
+		opponent.initiative[~player_turn] = 0
+
+		rows = np.arange(len(active))
+		seconds = wait.copy()
+		seconds[player_turn] += take_turn(tables, player, opponent, rows[player_turn], rng, 0, player_abilities)
+		seconds[~player_turn] += take_turn(tables, opponent, player, rows[~player_turn], rng, OPPONENT_DELAY, opponent_abilities)
+		lengths[active] += seconds
+
+		winners[active] = np.where(opponent.health <= 0, 1, np.where(player.health <= 0, -1, 0))
+		fainted = (player.health <= 0) | (opponent.health <= 0)
+		lengths[active[fainted]] += FAINT_TIME
+		over = fainted | (lengths[active] >= MAX_TIME)
+		active = active[~over]
+		player.take(~over)
+		opponent.take(~over)
+	return winners, lengths
+
+def matchup_matrix(names = None, levels = range(1, 51), trials = 100, seed = None):
+	# win and draw rates of the row species against the column species and the mean battle length, per level
+	names = list(names or MONSTER_DATA)
+	levels = np.array(levels)
+	damage_model.ensure_level(levels.max())
+	tables = build_tables(names)
+	rng = np.random.default_rng(seed)
+	size = len(names)
+
+	# [level, player species, opponent species, trial], a few levels per batch
+	shape = (len(levels), size, size, trials)
+	winners, lengths = np.zeros(shape, dtype = int), np.zeros(shape)
+	step = max(1, BATCH_SIZE // (size * size * trials))
+	for start in range(0, len(levels), step):
+		level_grid, player_species, opponent_species, _ = np.meshgrid(levels[start:start + step], np.arange(size), np.arange(size), np.arange(trials), indexing = 'ij')
+		batch_winners, batch_lengths = run_battles(tables, player_species.ravel(), opponent_species.ravel(), level_grid.ravel(), rng)
+		winners[start:start + step] = batch_winners.reshape(level_grid.shape)
+		lengths[start:start + step] = batch_lengths.reshape(level_grid.shape)
+	return names, levels, (winners == 1).mean(3), (winners == 0).mean(3), lengths.mean(3)
+
+def main():
+	parser = ArgumentParser(description = 'win rates for every pair of species')
+	parser.add_argument('--trials', type = int, default = 100)
+	parser.add_argument('--levels', type = int, nargs = 2, default = (1, 50), metavar = ('FIRST', 'LAST'))
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--output', help = 'json file for the results (default: stdout)')
+	args = parser.parse_args()
+
+	start_time = perf_counter()
+	names, levels, win_rates, draw_rates, mean_lengths = matchup_matrix(levels = range(args.levels[0], args.levels[1] + 1), trials = args.trials, seed = args.seed)
+	seconds = perf_counter() - start_time
+	results = {
+		'species': names,
+		'levels': levels.tolist(),
+		'trials': args.trials,
+		'battles': win_rates.size * args.trials,
+		'seconds': seconds,
+		'win_rate': win_rates.round(3).tolist(), # [level][player species][opponent species]
+		'draw_rate': draw_rates.round(3).tolist(),
+		'mean_length': mean_lengths.round(2).tolist(), # seconds
+	}
+
+	report = json.dumps(results)
+	if args.output:
+		with open(args.output, 'w') as file:
+			file.write(report)
+	else:
+		print(report)
+
+if __name__ == '__main__':
+	main()
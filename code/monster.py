@@ -1,14 +1,47 @@
 from game_data import MONSTER_DATA, ATTACK_DATA
 from random import randint
+from bisect import bisect_left
+from types import MappingProxyType
+
+# stats, stat summary, unlocked abilities and energy bands per (name, level), shared by all monsters,
+# what the getters hand out is read only so callers cannot change it for every other monster
+level_data = {}
+
+def get_level_data(name, level):
+	if (name, level) not in level_data:
+		base_stats = MONSTER_DATA[name]['stats']
+		stats = {stat: value * level for stat, value in base_stats.items() if stat != 'element'}
+		summary = MappingProxyType({
+			'health': stats['max_health'],
+			'energy': stats['max_energy'],
+			'attack': stats['attack'],
+			'defense': stats['defense'],
+			'speed': stats['speed'],
+			'recovery': stats['recovery'],
+		})
+		abilities = tuple(ability for lvl, ability in MONSTER_DATA[name]['abilities'].items() if level >= lvl)
+
+		# the affordable abilities only change when energy crosses a cost,
+		# band k holds them for low < energy <= high with k costs below energy
+		costs = tuple(sorted({ATTACK_DATA[ability]['cost'] for ability in abilities}))
+		bounds = (float('-inf'),) + costs + (float('inf'),)
+		bands = tuple((bounds[k], bounds[k + 1], tuple(ability for ability in abilities if ATTACK_DATA[ability]['cost'] < bounds[k + 1])) for k in range(len(costs) + 1))
+		level_data[(name, level)] = (stats, summary, abilities, costs, bands)
+	return level_data[(name, level)]
 
 class Monster:
+	__slots__ = (
+		'name', 'level', 'element', 'base_stats', 'health', 'energy', 'initiative', 'abilities', 'defending',
+		'xp', 'level_up', 'evolution',
+		'stats', 'summary', 'unlocked', 'costs', 'bands', 'band')
+
 	def __init__(self, name, level):
 		self.name, self.level = name, level
-		self.paused = False
 
-		# stats 
+		# stats
 		self.element = MONSTER_DATA[name]['stats']['element']
 		self.base_stats = MONSTER_DATA[name]['stats']
+		self.set_level(level)
 		self.health = self.base_stats['max_health'] * self.level
 		self.energy = self.base_stats['max_energy'] * self.level
 		self.initiative = 0
@@ -23,29 +56,31 @@ class Monster:
 	def __repr__(self):
 		return f'monster: {self.name}, lvl: {self.level}'
 
+	def set_level(self, level):
+		self.level = level
+		self.stats, self.summary, self.unlocked, self.costs, self.bands = get_level_data(self.name, level)
+		# checked against the energy on the next get_abilities call
+		self.band = self.bands[0]
+
 	def get_stat(self, stat):
-		return self.base_stats[stat] * self.level
+		return self.stats[stat]
 
 	def get_stats(self):
-		return {
-			'health': self.get_stat('max_health'),
-			'energy': self.get_stat('max_energy'),
-			'attack': self.get_stat('attack'),
-			'defense': self.get_stat('defense'),
-			'speed': self.get_stat('speed'),
-			'recovery': self.get_stat('recovery'),
-		}
+		return self.summary
 
 	def get_abilities(self, all  = True):
 		if all:
-			return [ability for lvl, ability in self.abilities.items() if self.level >= lvl]
-		else:
-			return [ability for lvl, ability in self.abilities.items() if self.level >= lvl and ATTACK_DATA[ability]['cost'] < self.energy]
+			return self.unlocked
+		low, high, affordable = self.band
+		if not low < self.energy <= high:
+			self.band = self.bands[bisect_left(self.costs, self.energy)]
+			affordable = self.band[2]
+		return affordable
 
 	def get_info(self):
 		return (
-			(self.health, self.get_stat('max_health')),
-			(self.energy, self.get_stat('max_energy')),
+			(self.health, self.stats['max_health']),
+			(self.energy, self.stats['max_energy']),
 			(self.initiative, 100)
 			)
 
@@ -53,21 +88,18 @@ class Monster:
 		self.energy -= ATTACK_DATA[attack]['cost']
 
 	def get_base_damage(self, attack):
-		return self.get_stat('attack') * ATTACK_DATA[attack]['amount']
+		return self.stats['attack'] * ATTACK_DATA[attack]['amount']
 
 	def update_xp(self, amount):
 		if self.level_up - self.xp > amount:
 			self.xp += amount
 		else:
-			self.level += 1
+			self.set_level(self.level + 1)
 			self.xp = amount - (self.level_up - self.xp)
 			self.level_up = self.level * 150
 
 	def stat_limiter(self):
-		self.health = max(0, min(self.health, self.get_stat('max_health')))
-		self.energy = max(0, min(self.energy, self.get_stat('max_energy')))
-
-	def update(self, dt):
-		self.stat_limiter()
-		if not self.paused:
-			self.initiative += self.get_stat('speed') * dt
\ No newline at end of file
+		health, max_health = self.health, self.stats['max_health']
+		energy, max_energy = self.energy, self.stats['max_energy']
+		self.health = 0 if health < 0 else max_health if health > max_health else health
+		self.energy = 0 if energy < 0 else max_energy if energy > max_energy else energy
@@ -0,0 +1,29 @@
+from settings import *
+from groups import AllSprites, CollisionSprites
+from spatial import TriggerZones
+
+class Scene:
+	# the sprite groups built from one map, kept alive while the map is cached
+	def __init__(self, shadow_surf, notice_surf):
+		self.all_sprites = AllSprites(shadow_surf, notice_surf)
+		self.collision_sprites = CollisionSprites()
+		self.character_sprites = pygame.sprite.Group()
+		self.transition_sprites = pygame.sprite.Group()
+		self.monster_sprites = pygame.sprite.Group()
+		self.triggers = TriggerZones()
+
+		self.player = None
+		# start position name -> (pos, facing direction) from the 'Entities' layer
+		self.player_starts = {}
+		self.chunk_memory = {}
+
+	def place_player(self, start_pos):
+		# puts the player back on a start position as if the map had just been built
+		pos, facing_direction = self.player_starts[start_pos]
+		player = self.player
+		player.rect.center = pos
+		player.hitbox.center = player.rect.center
+		player.previous_pos = vector(player.rect.topleft)
+		player.facing_direction = facing_direction
+		player.direction = vector()
+		player.blocked = player.noticed = False
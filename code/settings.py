@@ -7,8 +7,56 @@ from sys import exit
 WINDOW_WIDTH, WINDOW_HEIGHT = 1280, 720
 # size of each tile on the game map 
 TILE_SIZE = 64 
+# number of tiles per side in a pre-rendered terrain chunk, at 16 the 30 chunks baked for
+# the world map hold 112721920 bytes (~107.5 MiB) of 32 bit pixels in exchange for one blit per chunk
+CHUNK_SIZE = 16
+# size of a cell in the spatial hash used for culling sprites
+GRID_CELL_SIZE = TILE_SIZE * 4
+# size of a cell in the collision broadphase
+COLLISION_CELL_SIZE = TILE_SIZE * 2
+# size of a cell in the precomputed trainer vision
+VISION_CELL_SIZE = TILE_SIZE // 4
 # speed that animations update (lower = faster)
 ANIMATION_SPEED = 6
+# keep sliced and outlined frames in cache/assets.bin between launches
+ASSET_CACHE = True
+# decode images and sounds on a process pool at startup (0 workers = one per core)
+PARALLEL_IMPORT = True
+IMPORT_WORKERS = 0
+# parse maps on first use and prefetch the targets of the current map's transitions
+LAZY_MAPS = True
+# read maps compiled by map_compiler.py, falling back to the tmx files when missing or stale
+COMPILED_MAPS = True
+# stream these tracks through pygame.mixer.music, fading between them over MUSIC_FADE ms
+STREAM_MUSIC = True
+MUSIC_TRACKS = ('overworld', 'battle', 'evolution')
+MUSIC_FADE = 600
+# shape of the outline around highlighted monsters: 'square', 'diamond' or 'circle'
+OUTLINE_SHAPE = 'square'
+# built maps kept in memory, so walking back into them only swaps groups
+SCENE_CACHE_SIZE = 3
+# flipped, grayscale, scaled and white copies of frames kept around, in bytes
+DERIVED_CACHE_BYTES = 32 * 1024 * 1024
+# rendered battle menu and hud labels kept around
+TEXT_CACHE_SIZE = 256
+# pack monster, attack, icon and ui frames into shared pages of ATLAS_SIZE pixels
+TEXTURE_ATLAS = True
+ATLAS_SIZE = 2048
+# load monster frames on first use, keeping at most MONSTER_CACHE_SIZE species (a team plus a few encounters)
+LAZY_MONSTER_FRAMES = True
+MONSTER_CACHE_SIZE = 10
+# load the team and the grass species of the current map when it is set up
+PREFETCH_MONSTERS = True
+# bake water and coast tiles into one animated surface per region
+# (one blit per region, at the cost of a surface per region and frame)
+BAKE_ANIMATED_TILES = True
+# simulation runs in fixed steps of 1 / TICK_RATE seconds (False = one step per frame)
+FIXED_TIMESTEP = True
+TICK_RATE = 60
+# most simulation steps run in a single frame before time is dropped
+MAX_CATCHUP_STEPS = 5
+# frame rate cap for rendering (0 = uncapped)
+MAX_FPS = 120
 # thickness for battle elements
 BATTLE_OUTLINE_WIDTH = 4
 
@@ -0,0 +1,76 @@
+from settings import *
+from support import check_connections
+
+class SpatialHash:
+	def __init__(self, cell_size = TILE_SIZE):
+		self.cell_size = cell_size
+		self.cells = {}
+		self.item_cells = {}
+
+	def get_cells(self, rect):
+		left, top = int(rect.left // self.cell_size), int(rect.top // self.cell_size)
+		right, bottom = int((rect.right - 1) // self.cell_size), int((rect.bottom - 1) // self.cell_size)
+		return [(col, row) for col in range(left, right + 1) for row in range(top, bottom + 1)]
+
+	def insert(self, item, rect):
+		cells = self.get_cells(rect)
+		self.item_cells[item] = cells
+		for cell in cells:
+			self.cells.setdefault(cell, set()).add(item)
+
+	def remove(self, item):
+		for cell in self.item_cells.pop(item, ()):
+			bucket = self.cells[cell]
+			bucket.discard(item)
+			if not bucket:
+				del self.cells[cell]
+
+	def move(self, item, rect):
+		# only re-bucket when the item crossed a cell boundary
+		if self.get_cells(rect) != self.item_cells.get(item):
+			self.remove(item)
+			self.insert(item, rect)
+
+	def query(self, rect):
+		items = set()
+		for cell in self.get_cells(rect):
+			if cell in self.cells:
+				items |= self.cells[cell]
+		return items
+
+class TriggerZones:
+	def __init__(self, cell_size = TILE_SIZE * 2):
+		self.zone_grid = SpatialHash(cell_size)
+		self.character_grid = SpatialHash(cell_size)
+		self.kinds, self.order = {}, {}
+
+		# zones near the last queried hitbox
+		self.cached_cells = None
+		self.cached_zones = []
+
+	def add_zone(self, sprite, kind):
+		self.zone_grid.insert(sprite, sprite.rect)
+		self.kinds[sprite] = kind
+		self.order[sprite] = len(self.order)
+		self.cached_cells = None
+
+	def add_character(self, character):
+		self.character_grid.insert(character, character.rect)
+		self.order[character] = len(self.order)
+
+	def overlapping(self, kind, hitbox):
+		# the candidates only change when the hitbox enters other cells
+		cells = self.zone_grid.get_cells(hitbox)
+		if cells != self.cached_cells:
+			self.cached_cells = cells
+			self.cached_zones = sorted(self.zone_grid.query(hitbox), key = self.order.get)
+		return [zone for zone in self.cached_zones if self.kinds[zone] == kind and zone.rect.colliderect(hitbox)]
+
+	def interaction(self, entity, radius):
+		# first character within radius that entity is facing
+		for character in list(self.character_grid.item_cells):
+			self.character_grid.move(character, character.rect)
+		area = pygame.FRect(0, 0, radius * 2, radius * 2).move_to(center = entity.rect.center)
+		for character in sorted(self.character_grid.query(area), key = self.order.get):
+			if check_connections(radius, entity, character):
+				return character
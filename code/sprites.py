@@ -1,6 +1,7 @@
 from settings import * 
 from random import uniform
-from support import draw_bar
+from support import draw_bar, bar_width
+from derived import derived_surfaces, text_surfaces
 from timer import Timer # type: ignore
 
 # overworld sprites
@@ -13,6 +14,11 @@ class Sprite(pygame.sprite.Sprite):
 		self.y_sort = self.rect.centery
 		self.hitbox = self.rect.copy()
 
+class TerrainChunk(Sprite):
+	def __init__(self, pos, surf, groups):
+		super().__init__(pos, surf, groups, WORLD_LAYERS['bg'])
+		self.memory = surf.get_width() * surf.get_height() * surf.get_bytesize()
+
 class BorderSprite(Sprite):
 	def __init__(self, pos, surf, groups):
 		super().__init__(pos, surf, groups)
@@ -39,20 +45,24 @@ class MonsterPatchSprite(Sprite):
 		self.level = level
 
 class AnimatedSprite(Sprite):
-	def __init__(self, pos, frames, groups, z = WORLD_LAYERS['main']):
+	def __init__(self, pos, frames, groups, z = WORLD_LAYERS['main'], clock = None):
 		self.frame_index, self.frames = 0, frames
+		self.clock = clock
 		super().__init__(pos, frames[self.frame_index], groups, z)
 
 	def animate(self, dt):
-		self.frame_index += ANIMATION_SPEED * dt
-		self.image = self.frames[int(self.frame_index % len(self.frames))]
+		if self.clock:
+			self.image = self.clock.get_frame(self.frames)
+		else:
+			self.frame_index += ANIMATION_SPEED * dt
+			self.image = self.frames[int(self.frame_index % len(self.frames))]
 
 	def update(self, dt):
 		self.animate(dt)
 
 # battle sprites 
 class MonsterSprite(pygame.sprite.Sprite):
-	def __init__(self, pos, frames, groups, monster, index, pos_index, entity, apply_attack, create_monster):
+	def __init__(self, pos, frames, groups, monster, index, pos_index, entity):
 		# data
 		self.index = index 
 		self.pos_index = pos_index
@@ -62,10 +72,6 @@ class MonsterSprite(pygame.sprite.Sprite):
 		self.animation_speed = ANIMATION_SPEED + uniform(-1, 1)
 		self.z = BATTLE_LAYERS['monster']
 		self.highlight = False
-		self.target_sprite = None
-		self.current_attack = None
-		self.apply_attack = apply_attack
-		self.create_monster = create_monster
 
 		# sprite setup
 		super().__init__(groups)
@@ -74,51 +80,34 @@ class MonsterSprite(pygame.sprite.Sprite):
 
 		# timers 
 		self.timers = {
-			'remove highlight': Timer(300, func = lambda: self.set_highlight(False)),
-			'kill': Timer(600, func = self.destroy)
+			'remove highlight': Timer(300, func = lambda: self.set_highlight(False))
 		}
 
 	def animate(self, dt):
 		self.frame_index += ANIMATION_SPEED * dt
 		if self.state == 'attack' and self.frame_index >= len(self.frames['attack']):
-			self.apply_attack(self.target_sprite, self.current_attack, self.monster.get_base_damage(self.current_attack))
 			self.state = 'idle'
 
 		self.adjusted_frame_index = int(self.frame_index % len(self.frames[self.state]))
 		self.image = self.frames[self.state][self.adjusted_frame_index]
 
 		if self.highlight:
-			white_surf = pygame.mask.from_surface(self.image).to_surface()
-			white_surf.set_colorkey('black')
-			self.image = white_surf
+			self.image = derived_surfaces.get(self.image, 'white')
 
 	def set_highlight(self, value):
 		self.highlight = value
 		if value: 
 			self.timers['remove highlight'].activate()
 
-	def activate_attack(self, target_sprite, attack):
+	def activate_attack(self, attack):
+		# the damage is applied by the battle state once the animation is over
 		self.state = 'attack'
 		self.frame_index = 0
-		self.target_sprite = target_sprite
-		self.current_attack = attack
-		self.monster.reduce_energy(attack)
-
-	def delayed_kill(self, new_monster):
-		if not self.timers['kill'].active:
-			self.next_monster_data = new_monster
-			self.timers['kill'].activate()
-
-	def destroy(self):
-		if self.next_monster_data:
-			self.create_monster(*self.next_monster_data)
-		self.kill()
 
 	def update(self, dt):
 		for timer in self.timers.values():
 			timer.update()
 		self.animate(dt)
-		self.monster.update(dt)
 
 class MonsterOutlineSprite(pygame.sprite.Sprite):
 	def __init__(self, monster_sprite, groups, frames):
@@ -163,15 +152,21 @@ class MonsterLevelSprite(pygame.sprite.Sprite):
 		self.image = pygame.Surface((60,26))
 		self.rect = self.image.get_frect(topleft = pos) if entity == 'player' else self.image.get_frect(topright = pos)
 		self.xp_rect = pygame.FRect(0,self.rect.height - 2,self.rect.width,2)
+		# values on the image, it is only redrawn when they change
+		self.drawn = None
 
 	def update(self, _):
-		self.image.fill(COLORS['white'])
+		monster = self.monster_sprite.monster
+		values = (monster.level, bar_width(self.xp_rect.width, monster.xp, monster.level_up))
+		if values != self.drawn:
+			self.drawn = values
+			self.image.fill(COLORS['white'])
 
-		text_surf = self.font.render(f'Lvl {self.monster_sprite.monster.level}', False, COLORS['black'])
-		text_rect = text_surf.get_frect(center = (self.rect.width / 2, self.rect.height / 2))
-		self.image.blit(text_surf, text_rect)
+			text_surf = text_surfaces.render(self.font, f'Lvl {monster.level}', COLORS['black'])
+			text_rect = text_surf.get_frect(center = (self.rect.width / 2, self.rect.height / 2))
+			self.image.blit(text_surf, text_rect)
 
-		draw_bar(self.image, self.xp_rect, self.monster_sprite.monster.xp, self.monster_sprite.monster.level_up, COLORS['black'], COLORS['white'], 0)
+			draw_bar(self.image, self.xp_rect, monster.xp, monster.level_up, COLORS['black'], COLORS['white'], 0)
 
 		if not self.monster_sprite.groups():
 			self.kill()
@@ -184,22 +179,32 @@ class MonsterStatsSprite(pygame.sprite.Sprite):
 		self.rect = self.image.get_frect(midbottom = pos)
 		self.font = font
 		self.z = BATTLE_LAYERS['overlay']
+		# values on the image, it is only redrawn when they change
+		self.drawn = None
 
 	def update(self, _):
-		self.image.fill(COLORS['white'])
-
-		for index, (value, max_value) in enumerate(self.monster_sprite.monster.get_info()):
-			color = (COLORS['red'], COLORS['blue'], COLORS['gray'])[index]
-			if index < 2: # health and energy 
-				text_surf = self.font.render(f'{int(value)}/{max_value}', False, COLORS['black'])
-				text_rect = text_surf.get_frect(topleft = (self.rect.width * 0.05,index * self.rect.height / 2))
-				bar_rect = pygame.FRect(text_rect.bottomleft + vector(0,-2), (self.rect.width * 0.9, 4))
-
-				self.image.blit(text_surf, text_rect)
-				draw_bar(self.image, bar_rect, value, max_value, color, COLORS['black'], 2)
-			else: # initiative
-				init_rect = pygame.FRect((0, self.rect.height - 2), (self.rect.width, 2)) 
-				draw_bar(self.image, init_rect, value, max_value, color, COLORS['white'], 0)
+		info = self.monster_sprite.monster.get_info()
+		(health, max_health), (energy, max_energy), (initiative, max_initiative) = info
+		values = (
+			int(health), max_health, bar_width(self.rect.width * 0.9, health, max_health),
+			int(energy), max_energy, bar_width(self.rect.width * 0.9, energy, max_energy),
+			bar_width(self.rect.width, initiative, max_initiative))
+		if values != self.drawn:
+			self.drawn = values
+			self.image.fill(COLORS['white'])
+
+			for index, (value, max_value) in enumerate(info):
+				color = (COLORS['red'], COLORS['blue'], COLORS['gray'])[index]
+				if index < 2: # health and energy 
+					text_surf = text_surfaces.render(self.font, f'{int(value)}/{max_value}', COLORS['black'])
+					text_rect = text_surf.get_frect(topleft = (self.rect.width * 0.05,index * self.rect.height / 2))
+					bar_rect = pygame.FRect(text_rect.bottomleft + vector(0,-2), (self.rect.width * 0.9, 4))
+
+					self.image.blit(text_surf, text_rect)
+					draw_bar(self.image, bar_rect, value, max_value, color, COLORS['black'], 2)
+				else: # initiative
+					init_rect = pygame.FRect((0, self.rect.height - 2), (self.rect.width, 2)) 
+					draw_bar(self.image, init_rect, value, max_value, color, COLORS['white'], 0)
 
 		if not self.monster_sprite.groups():
 			self.kill()
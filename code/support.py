@@ -1,38 +1,71 @@
 from settings import *
-from os.path import join
+from os.path import join, normpath
 from os import walk
-from pytmx.util_pygame import load_pygame
+from time import perf_counter
+from math import lcm
+from map_loader import load_map
+
+# images and sounds decoded ahead of time by asset_pipeline.preload_assets
+decoded_assets = {}
+# seconds spent on each asset, in a worker ('decode') and on the main thread ('create')
+import_timings = {}
 
 # import functions
+def load_image(full_path, alpha = True):
+	start = perf_counter()
+	key = normpath(full_path)
+	if key in decoded_assets:
+		pixels, size = decoded_assets.pop(key)
+		surf = pygame.image.frombytes(pixels, size, 'RGBA')
+	else:
+		surf = pygame.image.load(full_path)
+	surf = surf.convert_alpha() if alpha else surf.convert()
+	import_timings.setdefault(key, {})['create'] = perf_counter() - start
+	return surf
+
+def load_sound(full_path):
+	start = perf_counter()
+	key = normpath(full_path)
+	if key in decoded_assets:
+		sound = pygame.mixer.Sound(buffer = decoded_assets.pop(key))
+	else:
+		sound = pygame.mixer.Sound(full_path)
+	import_timings.setdefault(key, {})['create'] = perf_counter() - start
+	return sound
+
+def cached(cache, key, sources, build):
+	# build() is skipped when the compiled asset cache has an up to date copy
+	return cache.get(key, sources, build) if cache else build()
+
 def import_image(*path, alpha = True, format = 'png'):
 	full_path = join(*path) + f'.{format}'
-	surf = pygame.image.load(full_path).convert_alpha() if alpha else pygame.image.load(full_path).convert()
+	surf = load_image(full_path, alpha)
 	return surf
 
-def import_folder(*path):
+def import_folder(*path, cache = None):
 	frames = []
 	for folder_path, sub_folders, image_names in walk(join(*path)):
 		for image_name in sorted(image_names, key = lambda name: int(name.split('.')[0])):
 			full_path = join(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = cached(cache, f'image:{full_path}', [full_path], lambda: load_image(full_path))
 			frames.append(surf)
 	return frames
 
-def import_folder_dict(*path):
+def import_folder_dict(*path, cache = None):
 	frames = {}
 	for folder_path, sub_folders, image_names in walk(join(*path)):
 		for image_name in image_names:
 			full_path = join(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = cached(cache, f'image:{full_path}', [full_path], lambda: load_image(full_path))
 			frames[image_name.split('.')[0]] = surf
 	return frames
 
-def import_sub_folders(*path):
+def import_sub_folders(*path, cache = None):
 	frames = {}
 	for _, sub_folders, __ in walk(join(*path)):
 		if sub_folders:
 			for sub_folder in sub_folders:
-				frames[sub_folder] = import_folder(*path, sub_folder)
+				frames[sub_folder] = import_folder(*path, sub_folder, cache = cache)
 	return frames
 
 def import_tilemap(cols, rows, *path):
@@ -49,23 +82,30 @@ def import_tilemap(cols, rows, *path):
 			frames[(col, row)] = cutout_surf
 	return frames
 
-def character_importer(cols, rows, *path):
-	frame_dict = import_tilemap(cols, rows, *path)
-	new_dict = {}
-	for row, direction in enumerate(('down', 'left', 'right', 'up')):
-		new_dict[direction] = [frame_dict[(col, row)] for col in range(cols)]
-		new_dict[f'{direction}_idle'] = [frame_dict[(0, row)]]
-	return new_dict
+def character_importer(cols, rows, *path, cache = None):
+	def build():
+		frame_dict = import_tilemap(cols, rows, *path)
+		new_dict = {}
+		for row, direction in enumerate(('down', 'left', 'right', 'up')):
+			new_dict[direction] = [frame_dict[(col, row)] for col in range(cols)]
+			new_dict[f'{direction}_idle'] = [frame_dict[(0, row)]]
+		return new_dict
+	full_path = join(*path) + '.png'
+	return cached(cache, f'character:{cols}x{rows}:{full_path}', [full_path], build)
 
-def all_character_import(*path):
+def all_character_import(*path, cache = None):
 	new_dict = {}
 	for _, __, image_names in walk(join(*path)):
 		for image in image_names:
 			image_name = image.split('.')[0]
-			new_dict[image_name] = character_importer(4,4,*path, image_name)
+			new_dict[image_name] = character_importer(4,4,*path, image_name, cache = cache)
 	return new_dict
 
-def coast_importer(cols, rows, *path):
+def coast_importer(cols, rows, *path, cache = None):
+	full_path = join(*path) + '.png'
+	return cached(cache, f'coast:{cols}x{rows}:{full_path}', [full_path], lambda: slice_coast(cols, rows, *path))
+
+def slice_coast(cols, rows, *path):
 	frame_dict = import_tilemap(cols, rows, *path)
 	new_dict = {}
 	terrains = ['grass', 'grass_i', 'sand_i', 'sand', 'rock', 'rock_i', 'ice', 'ice_i']
@@ -79,53 +119,139 @@ def coast_importer(cols, rows, *path):
 			new_dict[terrain][key] = [frame_dict[(pos[0] + index * 3, pos[1] + row)] for row in range(0,rows, 3)]
 	return new_dict
 
+def file_paths(*path):
+	# file names without extension -> full paths
+	paths = {}
+	for folder_path, sub_folders, file_names in walk(join(*path)):
+		for file in file_names:
+			paths[file.split('.')[0]] = join(folder_path, file)
+	return paths
+
 def tmx_importer(*path):
 	tmx_dict = {}
 	for folder_path, sub_folders, file_names in walk(join(*path)):
 		for file in file_names:
-			tmx_dict[file.split('.')[0]] = load_pygame(join(folder_path, file))
+			tmx_dict[file.split('.')[0]] = load_map(join(folder_path, file))
 	return tmx_dict
 
-def monster_importer(cols, rows, *path):
+def terrain_chunks(tmx_map, layers, chunk_size):
+	chunks = {}
+	for layer in layers:
+		for x, y, surf in tmx_map.get_layer_by_name(layer).tiles():
+			key = (x // chunk_size, y // chunk_size)
+			if key not in chunks:
+				width = min(chunk_size, tmx_map.width - key[0] * chunk_size) * TILE_SIZE
+				height = min(chunk_size, tmx_map.height - key[1] * chunk_size) * TILE_SIZE
+				chunks[key] = pygame.Surface((width, height), pygame.SRCALPHA)
+			chunks[key].blit(surf, ((x % chunk_size) * TILE_SIZE, (y % chunk_size) * TILE_SIZE))
+	# converted to the display format so blitting a chunk takes the fast path
+	return {(col * chunk_size * TILE_SIZE, row * chunk_size * TILE_SIZE): surf.convert_alpha() for (col, row), surf in chunks.items()}
+
+def bake_animated_tiles(tiles, chunk_size):
+	# tiles maps a tile position to the frame lists drawn there, bottom first
+	region_size = chunk_size * TILE_SIZE
+	unvisited = set(tiles)
+	regions = []
+	for start in tiles:
+		if start not in unvisited:
+			continue
+		# flood fill contiguous tiles, split along the terrain chunks
+		chunk = (start[0] // region_size, start[1] // region_size)
+		unvisited.remove(start)
+		stack, region = [start], []
+		while stack:
+			x, y = stack.pop()
+			region.append((x, y))
+			for neighbour in ((x + TILE_SIZE, y), (x - TILE_SIZE, y), (x, y + TILE_SIZE), (x, y - TILE_SIZE)):
+				if neighbour in unvisited and (neighbour[0] // region_size, neighbour[1] // region_size) == chunk:
+					unvisited.remove(neighbour)
+					stack.append(neighbour)
+
+		left, top = min(x for x, _ in region), min(y for _, y in region)
+		width = max(x for x, _ in region) - left + TILE_SIZE
+		height = max(y for _, y in region) - top + TILE_SIZE
+		frame_count = lcm(*[len(frames) for pos in region for frames in tiles[pos]])
+		region_frames = []
+		for index in range(frame_count):
+			surf = pygame.Surface((width, height), pygame.SRCALPHA)
+			for x, y in region:
+				for frames in tiles[(x, y)]:
+					surf.blit(frames[index % len(frames)], (x - left, y - top))
+			region_frames.append(surf)
+		regions.append(((left, top), region_frames))
+	return regions
+
+def monster_importer(cols, rows, *path, cache = None):
 	monster_dict = {}
-	for folder_path, sub_folders, image_names in walk(join(*path)):
-		for image in image_names:
-			image_name = image.split('.')[0]
-			monster_dict[image_name] = {}
-			frame_dict = import_tilemap(cols, rows, *path, image_name)
-			for row, key in enumerate(('idle', 'attack')):
-				monster_dict[image_name][key] = [frame_dict[(col,row)] for col in range(cols)]
+	for image_name in folder_names(*path):
+		monster_dict[image_name] = import_monster(cols, rows, *path, image_name, cache = cache)
 	return monster_dict
 
-def outline_creator(frame_dict, width):
+def import_monster(cols, rows, *path, cache = None):
+	def build():
+		frame_dict = import_tilemap(cols, rows, *path)
+		return {key: [frame_dict[(col,row)] for col in range(cols)] for row, key in enumerate(('idle', 'attack'))}
+	full_path = join(*path) + '.png'
+	return cached(cache, f'monster:{cols}x{rows}:{full_path}', [full_path], build)
+
+def folder_names(*path):
+	# file names without extension
+	return [file_name.split('.')[0] for _, __, file_names in walk(join(*path)) for file_name in file_names]
+
+def outline_creator(frame_dict, width, *path, shape = OUTLINE_SHAPE, cache = None):
+	# path is the monster folder, only needed to check the cache
 	outline_frame_dict = {}
 	for monster, monster_frames in frame_dict.items():
-		outline_frame_dict[monster] = {}
-		for state, frames in monster_frames.items():
-			outline_frame_dict[monster][state] = []
-			for frame in frames:
-				new_surf = pygame.Surface(vector(frame.get_size()) + vector(width * 2), pygame.SRCALPHA)
-				new_surf.fill((0,0,0,0))
-				white_frame = pygame.mask.from_surface(frame).to_surface()
-				white_frame.set_colorkey('black')
-
-				new_surf.blit(white_frame, (0,0))
-				new_surf.blit(white_frame, (width,0))
-				new_surf.blit(white_frame, (width * 2,0))
-				new_surf.blit(white_frame, (width * 2,width))
-				new_surf.blit(white_frame, (width * 2,width * 2))
-				new_surf.blit(white_frame, (width,width * 2))
-				new_surf.blit(white_frame, (0,width * 2))
-				new_surf.blit(white_frame, (0,width))
-				outline_frame_dict[monster][state].append(new_surf)
+		outline_frame_dict[monster] = import_outlines(monster_frames, width, *path, monster, shape = shape, cache = cache) if path else create_outlines(monster_frames, width, shape)
 	return outline_frame_dict
 
-def attack_importer(*path):
+def import_outlines(monster_frames, width, *path, shape = OUTLINE_SHAPE, cache = None):
+	full_path = join(*path) + '.png'
+	return cached(cache, f'outline:{width}:{shape}:{full_path}', [full_path], lambda: create_outlines(monster_frames, width, shape))
+
+def outline_kernel(width, shape):
+	size = width * 2 + 1
+	kernel = pygame.mask.Mask((size, size), fill = shape == 'square')
+	if shape != 'square':
+		for x in range(size):
+			for y in range(size):
+				dx, dy = abs(x - width), abs(y - width)
+				if (dx + dy <= width) if shape == 'diamond' else (dx * dx + dy * dy <= width * width):
+					kernel.set_at((x, y))
+	return kernel
+
+def create_outlines(monster_frames, width, shape = OUTLINE_SHAPE):
+	# every frame goes into one mask with room for the outline around each cell,
+	# which is dilated by the kernel in a single pass and then sliced again
+	frames = [frame for state_frames in monster_frames.values() for frame in state_frames]
+	if not frames:
+		return {state: [] for state in monster_frames}
+	cell_width = max(frame.get_width() for frame in frames) + width * 2
+	cell_height = max(frame.get_height() for frame in frames) + width * 2
+	sheet_mask = pygame.mask.Mask((cell_width * len(frames), cell_height))
+	for index, frame in enumerate(frames):
+		sheet_mask.draw(pygame.mask.from_surface(frame), (index * cell_width + width, width))
+
+	outline_mask = sheet_mask.convolve(outline_kernel(width, shape), pygame.mask.Mask(sheet_mask.get_size()), (-width, -width))
+	sheet = outline_mask.to_surface(setcolor = (255, 255, 255, 255), unsetcolor = (0, 0, 0, 0))
+
+	outline_frames, index = {}, 0
+	for state, state_frames in monster_frames.items():
+		outline_frames[state] = []
+		for frame in state_frames:
+			size = vector(frame.get_size()) + vector(width * 2)
+			outline_frames[state].append(sheet.subsurface((index * cell_width, 0), size))
+			index += 1
+	return outline_frames
+
+def attack_importer(*path, cache = None):
 	attack_dict = {}
 	for folder_path, _, image_names in walk(join(*path)):
 		for image in image_names:
 			image_name = image.split('.')[0]
-			attack_dict[image_name] = list(import_tilemap(4,1,folder_path, image_name).values())
+			full_path = join(folder_path, image)
+			build = lambda: list(import_tilemap(4,1,folder_path, image_name).values())
+			attack_dict[image_name] = cached(cache, f'attack:4x1:{full_path}', [full_path], build)
 	return attack_dict
 
 def audio_importer(*path):
@@ -133,7 +259,7 @@ def audio_importer(*path):
 	for folder_path, _, file_names in walk(join(*path)):
 		for file_name in file_names:
 			full_path = join(folder_path, file_name)
-			files[file_name.split('.')[0]] = pygame.mixer.Sound(full_path)
+			files[file_name.split('.')[0]] = load_sound(full_path)
 	return files
 
 # game functions
@@ -145,11 +271,39 @@ def draw_bar(surface, rect, value, max_value, color, bg_color, radius = 1):
 	pygame.draw.rect(surface, bg_color, bg_rect, 0, radius)
 	pygame.draw.rect(surface, color, progress_rect, 0, radius)
 
+def bar_width(width, value, max_value):
+	# whole pixels draw_bar fills, to tell whether a bar looks any different
+	return int(max(0, min(width, value * width / max_value)))
+
+def is_facing(direction, relation, tolerance):
+	return direction == 'left' and relation.x < 0 and abs(relation.y) < tolerance or\
+		   direction == 'right' and relation.x > 0 and abs(relation.y) < tolerance or\
+		   direction == 'up' and relation.y < 0 and abs(relation.x) < tolerance or\
+		   direction == 'down' and relation.y > 0 and abs(relation.x) < tolerance
+
 def check_connections(radius, entity, target, tolerance = 30):
 	relation = vector(target.rect.center) - vector(entity.rect.center)
 	if relation.length() < radius:
-		if entity.facing_direction == 'left' and relation.x < 0 and abs(relation.y) < tolerance or\
-		   entity.facing_direction == 'right' and relation.x > 0 and abs(relation.y) < tolerance or\
-		   entity.facing_direction == 'up' and relation.y < 0 and abs(relation.x) < tolerance or\
-		   entity.facing_direction == 'down' and relation.y > 0 and abs(relation.x) < tolerance:
-			return True
\ No newline at end of file
+		if is_facing(entity.facing_direction, relation, tolerance):
+			return True
+
+def vision_cells(origin, radius, direction, rects, cell_size, tolerance = 30):
+	# cells that overlap the view (see check_connections) and the rects that can block it,
+	# the exact view and line of sight checks run on whatever is in these cells
+	x, y = origin
+	left, top, right, bottom = {
+		'left': (x - radius, y - tolerance, x, y + tolerance),
+		'right': (x, y - tolerance, x + radius, y + tolerance),
+		'up': (x - tolerance, y - radius, x + tolerance, y),
+		'down': (x - tolerance, y, x + tolerance, y + radius)}[direction]
+	view_rect = pygame.FRect(left, top, right - left, bottom - top)
+	blocking_rects = [rect for rect in rects if rect.colliderect(view_rect)]
+
+	cells = set()
+	for col in range(int(left // cell_size), int(right // cell_size) + 1):
+		for row in range(int(top // cell_size), int(bottom // cell_size) + 1):
+			# the point of the cell closest to origin
+			closest = (min(max(x, col * cell_size), (col + 1) * cell_size), min(max(y, row * cell_size), (row + 1) * cell_size))
+			if vector(closest).distance_to(origin) < radius:
+				cells.add((col, row))
+	return cells, blocking_rects
\ No newline at end of file
@@ -25,4 +25,15 @@ class Timer:
 			current_time = get_ticks()
 			if current_time - self.start_time >= self.duration:
 				if self.func: self.func()
-				self.deactivate()
\ No newline at end of file
+				self.deactivate()
+
+class AnimationClock:
+	def __init__(self, speed):
+		self.speed = speed
+		self.frame_index = 0
+
+	def update(self, dt):
+		self.frame_index += self.speed * dt
+
+	def get_frame(self, frames):
+		return frames[int(self.frame_index % len(frames))]
\ No newline at end of file